@@ -0,0 +1,92 @@
+"""
+Micro-benchmark for the audio conversion stage.
+
+Compares the old upload path (convert_to_mp3 in main.py, then again inside
+transcribe_audio, each through a temp file) with the single piped conversion
+used now, for both MP3 and Opus output. Reports wall time and output size per
+minute of audio.
+
+Usage (from backend/):
+    python -m benchmarks.bench_convert --minutes 1 5 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import AUDIO_FORMATS, convert_to_mp3, open_converted_audio, clean_temp_files
+
+READ_CHUNK = 64 * 1024
+
+def make_test_audio(minutes, channels=2, sample_rate=44100, audio_format=None):
+    """
+    Generate a test signal of the given length with ffmpeg: WAV, or encoded like
+    audio_format ("mp3" / "opus") when given.
+    """
+    fmt = AUDIO_FORMATS[audio_format] if audio_format else None
+    path = tempfile.NamedTemporaryFile(delete=False, suffix=fmt["suffix"] if fmt else ".wav").name
+    encoding = ['-c:a', fmt["codec"], '-b:a', fmt["bitrate"], '-f', fmt["container"]] if fmt else []
+    command = [
+        'ffmpeg', '-y', '-nostdin',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate={sample_rate}:duration={minutes * 60}',
+        '-f', 'lavfi', '-i', f'anoisesrc=amplitude=0.05:sample_rate={sample_rate}:duration={minutes * 60}',
+        '-filter_complex', 'amix=inputs=2',
+        '-ac', str(channels),
+        '-ar', str(sample_rate),
+        *encoding,
+        path
+    ]
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return path
+
+def bench_legacy(input_path):
+    """Old path: two ffmpeg runs, each writing a temporary MP3."""
+    start = time.perf_counter()
+    first = convert_to_mp3(input_path)
+    second = convert_to_mp3(first)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(second)
+    clean_temp_files([first, second])
+    return elapsed, size
+
+def bench_piped(input_path, audio_format):
+    """New path: one ffmpeg run streaming to a pipe."""
+    start = time.perf_counter()
+    size = 0
+    with open_converted_audio(input_path, audio_format=audio_format) as stream:
+        while True:
+            chunk = stream.read(READ_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+    return time.perf_counter() - start, size
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark audio conversion per audio minute")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5])
+    args = parser.parse_args()
+
+    print(f"{'audio':>7} | {'variant':<16} | {'s/audio-min':>11} | {'KB/audio-min':>12}")
+    print("-" * 56)
+    for minutes in args.minutes:
+        stereo = make_test_audio(minutes)
+        # Already mono 16kHz MP3, so open_converted_audio passes it through without ffmpeg
+        mono16k = make_test_audio(minutes, channels=1, sample_rate=16000, audio_format="mp3")
+        try:
+            results = [
+                ("legacy 2x mp3", bench_legacy(stereo)),
+                ("piped mp3", bench_piped(stereo, "mp3")),
+                ("piped opus", bench_piped(stereo, "opus")),
+                ("mono16k passthru", bench_piped(mono16k, "mp3")),
+            ]
+            for name, (elapsed, size) in results:
+                print(f"{minutes:>5.1f}m | {name:<16} | {elapsed / minutes:>11.3f} | {size / 1024 / minutes:>12.1f}")
+        finally:
+            clean_temp_files([stereo, mono16k])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+End-to-end pipeline benchmark: upload -> convert -> transcribe -> summarize -> export.
+
+Starts `uvicorn main:app` with the fake transcription and LLM backends
+(TRANSCRIPTION_PROVIDER=fake, LLM_PROVIDER=fake) and a throwaway DATA_DIR, so no
+API keys or network calls are needed. Caches are disabled so every run does the
+full work. For each audio length and concurrency level it drives that many
+pipelines at once and reports throughput, p50/p95/p99 latency per endpoint and
+the server's peak resident memory.
+
+Fake backend latency and output size are set through the usual environment
+variables (FAKE_TRANSCRIPTION_*, FAKE_LLM_*), or the shortcuts below.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pipeline --minutes 5 30 --concurrency 1 4 16 --pipelines 20
+    python -m benchmarks.bench_pipeline --llm-latency 2 --llm-tokens 800 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import wave
+
+import httpx
+
+from benchmarks.bench_startup import BACKEND_DIR, free_port
+
+JOB_POLL_INTERVAL = 0.05
+
+def make_test_audio(minutes, sample_rate=16000):
+    """Write a mono 16-bit noise WAV of the given length (already in the transcription format)."""
+    path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
+    with wave.open(path, "wb") as output:
+        output.setnchannels(1)
+        output.setsampwidth(2)
+        output.setframerate(sample_rate)
+        for _ in range(int(minutes * 60)):
+            output.writeframes(os.urandom(sample_rate * 2))
+    return path
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def read_memory_kb(pid):
+    """Return (current, peak) resident set size of a process in KiB, from /proc (Linux only)."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                name, _, value = line.partition(":")
+                if name in ("VmRSS", "VmHWM"):
+                    values[name] = int(value.split()[0])
+    except OSError:
+        return None, None
+    return values.get("VmRSS"), values.get("VmHWM")
+
+def reset_peak_memory(pid):
+    """Reset the kernel's peak RSS counter so each level reports its own peak."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+class Server:
+    """A uvicorn worker running the app against fake backends."""
+
+    def __init__(self, extra_env):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.env = dict(
+            os.environ,
+            DATA_DIR=tempfile.mkdtemp(prefix="summeet-bench-"),
+            TRANSCRIPTION_PROVIDER="fake",
+            LLM_PROVIDER="fake",
+            TRANSCRIPT_CACHE_ENABLED="false",
+            SUMMARY_CACHE_ENABLED="false",
+            **extra_env
+        )
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port)],
+            cwd=BACKEND_DIR, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(f"{self.base_url}/", timeout=1):
+                    return self
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__(None, None, None)
+        raise RuntimeError("Server did not start within 30s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+async def timed(timings, name, request):
+    """Await an httpx request, record its latency under name and return the response."""
+    start = time.perf_counter()
+    response = await request
+    timings.setdefault(name, []).append(time.perf_counter() - start)
+    response.raise_for_status()
+    return response
+
+async def run_pipeline(client, audio_path, timings):
+    """Upload one file, wait for its transcript, summarize it and export the result."""
+    start = time.perf_counter()
+    with open(audio_path, "rb") as audio:
+        response = await timed(timings, "POST /upload", client.post(
+            "/upload", files={"file": (os.path.basename(audio_path), audio, "audio/wav")}
+        ))
+    job_id = response.json()["job_id"]
+
+    job_start = time.perf_counter()
+    while True:
+        job = (await timed(timings, "GET /jobs/{id}", client.get(f"/jobs/{job_id}"))).json()
+        if job["status"] == "completed":
+            break
+        if job["status"] == "failed":
+            raise RuntimeError(f"Job {job_id} failed: {job['error']}")
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+    timings.setdefault("job (queued -> completed)", []).append(time.perf_counter() - job_start)
+
+    transcription_id = job["transcription_id"]
+    await timed(timings, "GET /transcription/{id}", client.get(f"/transcription/{transcription_id}"))
+    await timed(timings, "POST /summarize/{id}", client.post(f"/summarize/{transcription_id}", params={"force": "true"}))
+    await timed(timings, "GET /export/{id}", client.get(f"/export/{transcription_id}"))
+    await timed(timings, "GET /transcriptions", client.get("/transcriptions"))
+
+    timings.setdefault("pipeline", []).append(time.perf_counter() - start)
+
+async def run_level(server, audio_path, concurrency, pipelines):
+    """Run `pipelines` pipelines with at most `concurrency` in flight; return (timings, wall seconds)."""
+    timings = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+
+    async def one(client):
+        async with semaphore:
+            await run_pipeline(client, audio_path, timings)
+
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=600, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client) for _ in range(pipelines)))
+        return timings, time.perf_counter() - start
+
+def summarize_level(minutes, concurrency, pipelines, timings, wall_seconds, memory):
+    rss_kb, peak_kb = memory
+    return {
+        "audio_minutes": minutes,
+        "concurrency": concurrency,
+        "pipelines": pipelines,
+        "wall_seconds": round(wall_seconds, 3),
+        "pipelines_per_second": round(pipelines / wall_seconds, 3),
+        "requests_per_second": round(
+            sum(len(v) for k, v in timings.items() if k.split()[0] in ("GET", "POST")) / wall_seconds, 2
+        ),
+        "server_rss_mb": round(rss_kb / 1024, 1) if rss_kb else None,
+        "server_peak_rss_mb": round(peak_kb / 1024, 1) if peak_kb else None,
+        "latency_seconds": {
+            name: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 4),
+                "p95": round(percentile(values, 95), 4),
+                "p99": round(percentile(values, 99), 4),
+            }
+            for name, values in timings.items()
+        },
+    }
+
+def print_level(result):
+    peak = result["server_peak_rss_mb"]
+    print(
+        f"\n== {result['audio_minutes']} min audio, concurrency {result['concurrency']}: "
+        f"{result['pipelines_per_second']:.2f} pipelines/s, {result['requests_per_second']:.1f} req/s, "
+        f"peak RSS {f'{peak:.1f} MB' if peak else 'n/a'}"
+    )
+    print(f"{'endpoint':<28} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, stats in result["latency_seconds"].items():
+        print(
+            f"{name:<28} {stats['count']:>6} "
+            f"{stats['p50'] * 1000:>7.1f}ms {stats['p95'] * 1000:>7.1f}ms {stats['p99'] * 1000:>7.1f}ms"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the full pipeline against fake backends")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5], help="Audio lengths to test")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--pipelines", type=int, default=20, help="Pipelines per concurrency level")
+    parser.add_argument("--transcription-latency", type=float, help="FAKE_TRANSCRIPTION_LATENCY_SECONDS")
+    parser.add_argument("--words-per-utterance", type=int, help="FAKE_TRANSCRIPTION_WORDS_PER_UTTERANCE")
+    parser.add_argument("--llm-latency", type=float, help="FAKE_LLM_LATENCY_SECONDS")
+    parser.add_argument("--llm-tokens", type=int, help="FAKE_LLM_OUTPUT_TOKENS")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    overrides = {
+        "FAKE_TRANSCRIPTION_LATENCY_SECONDS": args.transcription_latency,
+        "FAKE_TRANSCRIPTION_WORDS_PER_UTTERANCE": args.words_per_utterance,
+        "FAKE_LLM_LATENCY_SECONDS": args.llm_latency,
+        "FAKE_LLM_OUTPUT_TOKENS": args.llm_tokens,
+    }
+    extra_env = {name: str(value) for name, value in overrides.items() if value is not None}
+
+    results = []
+    with Server(extra_env) as server:
+        for minutes in args.minutes:
+            audio_path = make_test_audio(minutes)
+            try:
+                for concurrency in args.concurrency:
+                    reset_peak_memory(server.process.pid)
+                    timings, wall_seconds = asyncio.run(
+                        run_level(server, audio_path, concurrency, args.pipelines)
+                    )
+                    result = summarize_level(
+                        minutes, concurrency, args.pipelines, timings, wall_seconds,
+                        read_memory_kb(server.process.pid)
+                    )
+                    print_level(result)
+                    results.append(result)
+            finally:
+                os.unlink(audio_path)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Startup benchmark: time from launching a uvicorn worker to its first served request.
+
+Each run starts `uvicorn main:app` in a fresh process with a throwaway DATA_DIR,
+polls GET / until it answers, then stops the process. No API keys are needed,
+since nothing talks to the LLM or AssemblyAI until a request asks for it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_first_request(timeout=30.0):
+    """Start one worker and return seconds until GET / succeeds."""
+    port = free_port()
+    env = dict(os.environ, DATA_DIR=tempfile.mkdtemp(prefix="summeet-bench-"))
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"Server did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process start to first served request")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    timings = []
+    for run in range(args.runs):
+        elapsed = time_to_first_request()
+        timings.append(elapsed)
+        print(f"run {run + 1}: {elapsed:.3f}s")
+
+    print(f"min {min(timings):.3f}s | median {statistics.median(timings):.3f}s | max {max(timings):.3f}s")
+
+if __name__ == "__main__":
+    main()
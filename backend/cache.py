@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models import TranscriptCacheEntry, SummaryCacheEntry, SectionSummary
+from metrics import CACHE_REQUESTS
+
+# Transcription cache limits
+TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() == "true"
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))  # 200MB
+TRANSCRIPT_CACHE_TTL_DAYS = int(os.getenv("TRANSCRIPT_CACHE_TTL_DAYS", "90"))
+
+# Summary cache limits
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() == "true"
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "1000"))
+SUMMARY_CACHE_TTL_DAYS = int(os.getenv("SUMMARY_CACHE_TTL_DAYS", "30"))
+
+_stats = {
+    "transcript": {"hits": 0, "misses": 0, "stores": 0, "evictions": 0},
+    "summary": {"hits": 0, "misses": 0, "stores": 0, "evictions": 0},
+    "section": {"hits": 0, "misses": 0, "stores": 0, "evictions": 0},
+}
+_stats_lock = threading.Lock()
+
+# Counters that are also exported as summeet_cache_requests_total{result=...}
+_LOOKUP_RESULTS = {"hits": "hit", "misses": "miss"}
+
+def _count(cache_name, counter, amount=1):
+    with _stats_lock:
+        _stats[cache_name][counter] += amount
+    if counter in _LOOKUP_RESULTS:
+        CACHE_REQUESTS.inc(amount, cache=cache_name, result=_LOOKUP_RESULTS[counter])
+
+def cache_stats():
+    """Return a snapshot of the hit/miss counters for every cache."""
+    with _stats_lock:
+        return {name: dict(counters) for name, counters in _stats.items()}
+
+def _hash_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _lookup(db, model, cache_key, cache_name, ttl_days):
+    """Fetch a live entry, expiring it if it is older than ttl_days, and update hit/miss counters."""
+    entry = db.get(model, cache_key)
+    if entry and entry.created_at < datetime.utcnow() - timedelta(days=ttl_days):
+        db.delete(entry)
+        db.commit()
+        _count(cache_name, "evictions")
+        entry = None
+
+    if entry is None:
+        _count(cache_name, "misses")
+        return None
+
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_used_at = datetime.utcnow()
+    db.commit()
+    _count(cache_name, "hits")
+    return entry
+
+def _upsert(db, model, cache_key, cache_name, commit=True, **fields):
+    """Insert or replace an entry and reset its timestamps (commit=False leaves committing to the caller)."""
+    entry = db.get(model, cache_key)
+    if entry is None:
+        entry = model(cache_key=cache_key)
+        db.add(entry)
+    for name, value in fields.items():
+        setattr(entry, name, value)
+    entry.created_at = datetime.utcnow()
+    entry.last_used_at = datetime.utcnow()
+    if commit:
+        db.commit()
+    _count(cache_name, "stores")
+
+def _evict(db, model, cache_name, ttl_days, max_bytes=None, max_entries=None):
+    """Drop expired entries, then least recently used ones until the cache fits its limits."""
+    cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+    evicted = db.query(model).filter(model.created_at < cutoff).delete(synchronize_session=False)
+
+    total_bytes, total_entries = db.query(
+        func.coalesce(func.sum(model.size_bytes), 0), func.count(model.cache_key)
+    ).one()
+
+    def over_limit():
+        return (max_bytes is not None and total_bytes > max_bytes) or \
+               (max_entries is not None and total_entries > max_entries)
+
+    if over_limit():
+        oldest = db.query(model.cache_key, model.size_bytes).order_by(model.last_used_at.asc()).all()
+        for cache_key, size in oldest:
+            if not over_limit():
+                break
+            db.query(model).filter(model.cache_key == cache_key).delete(synchronize_session=False)
+            total_bytes -= size or 0
+            total_entries -= 1
+            evicted += 1
+
+    db.commit()
+    if evicted:
+        _count(cache_name, "evictions", evicted)
+    return evicted
+
+def transcription_cache_key(content_hash, language="auto", word_boost="", speaker_labels=True):
+    """Build the cache key from the audio SHA-256 and the TranscriptionConfig inputs."""
+    words = sorted(word.strip() for word in word_boost.split(",") if word.strip()) if word_boost else []
+    return _hash_key("transcript", content_hash, language, words, bool(speaker_labels))
+
+def get_cached_transcription(db, cache_key):
+    """Return the cached {"text", "speakers", "utterances"} result for cache_key, or None on a miss."""
+    if not TRANSCRIPT_CACHE_ENABLED:
+        return None
+    entry = _lookup(db, TranscriptCacheEntry, cache_key, "transcript", TRANSCRIPT_CACHE_TTL_DAYS)
+    if entry is None:
+        return None
+    return {
+        "text": entry.text,
+        "speakers": entry.speakers,
+        "utterances": json.loads(entry.utterances) if entry.utterances else None
+    }
+
+def store_transcription(db, cache_key, content_hash, result):
+    """Store a transcription result and evict old entries if the cache is over its limits."""
+    if not TRANSCRIPT_CACHE_ENABLED:
+        return
+    utterances = json.dumps(result["utterances"]) if result.get("utterances") else None
+    size = sum(len((value or "").encode("utf-8")) for value in (result["text"], result["speakers"], utterances))
+    _upsert(
+        db, TranscriptCacheEntry, cache_key, "transcript",
+        content_hash=content_hash, text=result["text"], speakers=result["speakers"],
+        utterances=utterances, size_bytes=size
+    )
+    evict_transcription_cache(db)
+
+def evict_transcription_cache(db):
+    """Drop expired entries, then least recently used ones until the cache fits TRANSCRIPT_CACHE_MAX_BYTES."""
+    return _evict(db, TranscriptCacheEntry, "transcript", TRANSCRIPT_CACHE_TTL_DAYS, max_bytes=TRANSCRIPT_CACHE_MAX_BYTES)
+
+def summary_cache_key(transcript, speaker_table, language, temperature, model):
+    """Build the cache key from exactly the inputs that change a summary."""
+    speakers = [list(row) for row in speaker_table] if speaker_table else []
+    return _hash_key("summary", transcript or "", speakers, language, float(temperature), model)
+
+def get_cached_summary(db, cache_key):
+    """Return the cached summary text for cache_key, or None on a miss."""
+    if not SUMMARY_CACHE_ENABLED:
+        return None
+    entry = _lookup(db, SummaryCacheEntry, cache_key, "summary", SUMMARY_CACHE_TTL_DAYS)
+    return entry.summary if entry else None
+
+def store_summary(db, cache_key, summary):
+    """Store a generated summary and evict old entries if the cache is over its limits."""
+    if not SUMMARY_CACHE_ENABLED:
+        return
+    _upsert(db, SummaryCacheEntry, cache_key, "summary", summary=summary, size_bytes=len(summary.encode("utf-8")))
+    evict_summary_cache(db)
+
+def store_summaries(db, summaries):
+    """
+    Store several (cache_key, summary) pairs and evict once. The entries are committed
+    in a single transaction together with any writes already pending on db.
+    """
+    if not SUMMARY_CACHE_ENABLED or not summaries:
+        return
+    for cache_key, summary in summaries:
+        _upsert(
+            db, SummaryCacheEntry, cache_key, "summary", commit=False,
+            summary=summary, size_bytes=len(summary.encode("utf-8"))
+        )
+    db.flush()
+    evict_summary_cache(db)
+
+def evict_summary_cache(db):
+    """Drop expired summaries, then least recently used ones beyond SUMMARY_CACHE_MAX_ENTRIES."""
+    return _evict(db, SummaryCacheEntry, "summary", SUMMARY_CACHE_TTL_DAYS, max_entries=SUMMARY_CACHE_MAX_ENTRIES)
+
+def get_section_notes(db, transcription_id):
+    """Return {fingerprint: notes} of the stored section summaries of a transcription."""
+    rows = db.query(SectionSummary.fingerprint, SectionSummary.notes).filter(
+        SectionSummary.transcription_id == transcription_id
+    ).all()
+    return {fingerprint: notes for fingerprint, notes in rows}
+
+def store_section_notes(db, transcription_id, previous, current):
+    """
+    Replace the stored section summaries of a transcription with `current` ({fingerprint: notes}),
+    given what get_section_notes returned before summarizing. Only the difference is written.
+    Caller commits.
+    """
+    stale = [fingerprint for fingerprint in previous if fingerprint not in current]
+    added = [fingerprint for fingerprint in current if fingerprint not in previous]
+    if stale:
+        db.query(SectionSummary).filter(
+            SectionSummary.transcription_id == transcription_id,
+            SectionSummary.fingerprint.in_(stale)
+        ).delete(synchronize_session=False)
+    for fingerprint in added:
+        db.merge(SectionSummary(transcription_id=transcription_id, fingerprint=fingerprint, notes=current[fingerprint]))
+
+    _count("section", "hits", len(current) - len(added))
+    _count("section", "misses", len(added))
+    _count("section", "stores", len(added))
+    _count("section", "evictions", len(stale))
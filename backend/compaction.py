@@ -0,0 +1,105 @@
+import os
+import re
+
+# Compaction rules applied to transcripts before summarization, in this order
+COMPACTION_RULES = ("whitespace", "disfluencies", "merge_speakers")
+TRANSCRIPT_COMPACTION = [
+    rule.strip() for rule in os.getenv("TRANSCRIPT_COMPACTION", ",".join(COMPACTION_RULES)).split(",")
+    if rule.strip()
+]
+
+_CJK_CHAR = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+_SPEAKER_LINE = re.compile(r"^Speaker ([^:\n]+):[ \t]?(.*)$")
+
+# Filler words with the comma or period around them. Only whole words count ("er" but not "her"),
+# and only in lower or sentence case, so acronyms such as "MM" or "UM" are left alone. "mm" after
+# a number is the unit, so "5 mm wide" is kept.
+_FILLERS = re.compile(
+    r"(?:[,，][ \t]*)?(?<![\w'-])"
+    r"(?:[uU]h+m*|[uU]m+|[eE]r+m+|[eE]r|[aA]h+|[hH]m+|(?<!\d[ \t])(?<!\d\u00a0)[mM]m+)"
+    r"(?![\w'-])[,，.。]?"
+)
+_CJK_FILLERS = re.compile(r"[嗯呃]+[，,、]?")
+# Stutters: a word broken off with a dash ("we- we") or said three or more times in a row
+# ("the the the", "I, I, I"). Only alphabetic words count, so figures such as "5-5" or "2 2 2"
+# survive, and a single repeat ("had had", "no, no") or a compound ("bye-bye") is kept.
+_STUTTER = re.compile(
+    r"\b([^\W\d_]+)(?:\s*-\s+\1\b|(?:,?\s+\1\b){2,})(?![\w-])",
+    re.IGNORECASE
+)
+_SPACE_BEFORE_PUNCTUATION = re.compile(r"[ \t]+([,.!?;:，。！？；：])")
+_LEADING_PUNCTUATION = re.compile(r"^[,，、;；\s]+")
+
+def estimate_tokens(text):
+    """Roughly estimate LLM tokens: about one per CJK character and one per four other characters."""
+    if not text:
+        return 0
+    cjk = len(_CJK_CHAR.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def collapse_whitespace(transcript):
+    """Collapse runs of spaces and tabs, trim lines and drop blank ones."""
+    lines = (re.sub(r"[ \t\u00a0]+", " ", line).strip() for line in transcript.splitlines())
+    return "\n".join(line for line in lines if line)
+
+def strip_disfluencies(transcript):
+    """Remove filler words (um, uh, 嗯, ...) and stutters, keeping the "Speaker X:" prefixes intact."""
+    lines = []
+    for line in transcript.splitlines():
+        match = _SPEAKER_LINE.match(line)
+        prefix, body = (f"Speaker {match.group(1)}: ", match.group(2)) if match else ("", line)
+        body = _FILLERS.sub("", body)
+        body = _CJK_FILLERS.sub("", body)
+        body = _STUTTER.sub(r"\1", body)
+        body = re.sub(r"[ \t]{2,}", " ", body)
+        body = _SPACE_BEFORE_PUNCTUATION.sub(r"\1", body)
+        body = _LEADING_PUNCTUATION.sub("", body).rstrip()
+        if body or not match:
+            # A turn that was nothing but fillers is dropped entirely
+            lines.append(prefix + body)
+    return "\n".join(lines)
+
+def merge_speaker_turns(transcript):
+    """Join consecutive turns of the same speaker into one "Speaker X:" line."""
+    lines = []
+    current_speaker = None
+    for line in transcript.splitlines():
+        match = _SPEAKER_LINE.match(line)
+        if match and match.group(1) == current_speaker and lines:
+            lines[-1] = f"{lines[-1]} {match.group(2)}".rstrip()
+            continue
+        if match:
+            current_speaker = match.group(1)
+        lines.append(line)
+    return "\n".join(lines)
+
+_RULES = {
+    "whitespace": collapse_whitespace,
+    "disfluencies": strip_disfluencies,
+    "merge_speakers": merge_speaker_turns,
+}
+
+def compact_transcript(transcript, rules=None):
+    """
+    Apply compaction rules (default: TRANSCRIPT_COMPACTION) to a transcript.
+    Returns (compacted_text, report) where report holds the rules applied and the
+    estimated token count before and after.
+    """
+    rules = TRANSCRIPT_COMPACTION if rules is None else rules
+    unknown = [rule for rule in rules if rule not in _RULES]
+    if unknown:
+        raise ValueError(f"Unknown compaction rules: {', '.join(unknown)}")
+
+    tokens_before = estimate_tokens(transcript)
+    compacted = transcript or ""
+    for rule in COMPACTION_RULES:
+        if rule in rules:
+            compacted = _RULES[rule](compacted)
+
+    tokens_after = estimate_tokens(compacted)
+    return compacted, {
+        "rules": [rule for rule in COMPACTION_RULES if rule in rules],
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "saved_ratio": round(1 - tokens_after / tokens_before, 3) if tokens_before else 0.0,
+    }
@@ -0,0 +1,178 @@
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-compressed only
+    brotli = None
+
+# Compress text responses at least this large for clients that accept gzip or brotli
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # the default of 11 is too slow for responses built per request
+
+# Server-Sent Events are left alone: a compressor would hold deltas back until it has a block
+_COMPRESSIBLE_TYPES = ("application/json", "text/markdown", "text/plain", "text/html", "text/csv")
+
+# A compressed body is a different representation, so its strong ETag gets a suffix
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+def _accepted_encodings(header):
+    """Encodings from an Accept-Encoding header that the client did not refuse with q=0."""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+def choose_encoding(accept_encoding):
+    """Pick brotli when the client takes it and it is installed, else gzip, else None."""
+    accepted = _accepted_encodings(accept_encoding or "")
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header matches etag. Uses weak comparison, as RFC 9110
+    requires for If-None-Match, and ignores the suffix added for compressed bodies.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        for suffix in ETAG_SUFFIXES.values():
+            if candidate.endswith(f'{suffix}"'):
+                candidate = candidate[:-len(suffix) - 1] + '"'
+                break
+        if candidate == etag:
+            return True
+    return False
+
+class _Compressor:
+    """Incremental brotli or gzip compressor with one interface for both."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 writes a gzip header and trailer around the deflate stream
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing JSON and text responses of COMPRESSION_MIN_BYTES or more
+    with brotli or gzip, whichever the client accepts (brotli preferred). Streamed
+    responses are compressed as they are sent.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["start"] is not None:
+                start, state["start"] = state["start"], None
+                response_headers = {name.lower(): value for name, value in start.get("headers", [])}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+                content_length = response_headers.get(b"content-length")
+                # Too small to be worth it: a single short body, or a declared length under the minimum
+                too_small = (
+                    len(body) < self.minimum_size if not more_body
+                    else content_length is not None and int(content_length) < self.minimum_size
+                )
+                if (
+                    content_type not in _COMPRESSIBLE_TYPES
+                    or b"content-encoding" in response_headers
+                    or start["status"] in (204, 304)
+                    or too_small
+                ):
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = state["compressor"] = _Compressor(encoding)
+                if not more_body:
+                    data = compressor.compress(body) + compressor.finish()
+                    headers = self._compressed_headers(start.get("headers", []), encoding, len(data))
+                    await send(dict(start, headers=headers))
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send(dict(start, headers=self._compressed_headers(start.get("headers", []), encoding)))
+
+            if state["passthrough"]:
+                await send(message)
+                return
+
+            compressor = state["compressor"]
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _compressed_headers(headers, encoding, content_length=None):
+        """Headers for the compressed body: its length if known, the encoding, Vary and a suffixed ETag."""
+        result = []
+        for name, value in headers:
+            lowered = name.lower()
+            if lowered == b"content-length":
+                continue
+            if lowered == b"etag" and value.endswith(b'"'):
+                value = value[:-1] + ETAG_SUFFIXES[encoding].encode() + b'"'
+            result.append((name, value))
+        if content_length is not None:
+            result.append((b"content-length", str(content_length).encode()))
+        result.append((b"content-encoding", encoding.encode()))
+        result.append((b"vary", b"Accept-Encoding"))
+        return result
@@ -0,0 +1,363 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, update, delete, func, or_, and_
+
+from models import SessionLocal, Transcription, UploadJob
+from utterances import save_utterances, parse_utterances
+from cache import transcription_cache_key, get_cached_transcription, store_transcription
+from services import clean_temp_files
+from transcribers import transcribe_file
+from metrics import current_trace_id, stage_timer
+
+# Number of uploads that may be converted/transcribed at the same time, per worker process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+
+# How long finished jobs stay queryable before they are deleted
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+
+# A claimed job belongs to its worker until the lease runs out; the worker renews it every
+# JOB_HEARTBEAT_SECONDS while the job runs. Jobs whose lease expired are claimed again, up
+# to JOB_MAX_ATTEMPTS times in total.
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# How often an idle worker looks for jobs submitted by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+
+_PRUNE_INTERVAL_SECONDS = 300
+
+# Pipeline stages, in order, with a rough progress value for each
+JOB_STAGES = {
+    "queued": 0,
+    "converting": 10,
+    "transcribing": 30,
+    "saving": 90,
+    "completed": 100,
+}
+
+# Identifies this process as the owner of the leases it takes
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_executor = None
+_dispatcher = None
+_stop = threading.Event()
+_wake = threading.Event()
+_running = {}  # job id -> Future, for jobs this process has claimed
+_running_lock = threading.Lock()
+
+def job_to_dict(job):
+    """Serialize an UploadJob row for the API."""
+    now = job.finished_at or time.time()
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "size_bytes": job.size_bytes,
+        "content_hash": job.content_hash,
+        "cache_hit": bool(job.cache_hit),
+        "status": job.status,
+        "stage": job.stage,
+        "progress": JOB_STAGES.get(job.stage, 0),
+        "attempts": job.attempts,
+        "elapsed_seconds": round(now - job.created_at, 2),
+        "processing_seconds": round(now - job.started_at, 2) if job.started_at else None,
+        "error": job.error,
+        "transcription_id": job.transcription_id,
+        "silence_removed_seconds": job.silence_removed_seconds,
+        "trace_id": job.trace_id,
+    }
+
+def _claimable(now):
+    """Jobs nobody works on: queued ones, and running ones whose owner stopped renewing the lease."""
+    return or_(
+        UploadJob.status == "queued",
+        and_(UploadJob.status == "running", UploadJob.lease_expires_at < now),
+    )
+
+def _update_own_job(db, job_id, **values):
+    """Update a job only while this process still holds its lease. Returns whether it did."""
+    result = db.execute(
+        update(UploadJob)
+        .where(UploadJob.id == job_id, UploadJob.lease_owner == WORKER_ID)
+        .values(**values)
+    )
+    return result.rowcount == 1
+
+def _set_stage(job_id, stage):
+    db = SessionLocal()
+    try:
+        _update_own_job(db, job_id, stage=stage)
+        db.commit()
+    finally:
+        db.close()
+
+def _fail_exhausted_jobs(db, now):
+    """Give up on expired jobs that already used all their attempts."""
+    exhausted = db.execute(
+        select(UploadJob.id, UploadJob.file_path, UploadJob.lease_owner).where(
+            UploadJob.status == "running",
+            UploadJob.lease_expires_at < now,
+            UploadJob.attempts >= JOB_MAX_ATTEMPTS,
+        )
+    ).all()
+    db.rollback()
+    for job_id, file_path, owner in exhausted:
+        result = db.execute(
+            update(UploadJob)
+            .where(UploadJob.id == job_id, UploadJob.lease_owner == owner, UploadJob.lease_expires_at < now)
+            .values(
+                status="failed", lease_owner=None, lease_expires_at=None, finished_at=now,
+                error=f"Worker stopped responding; gave up after {JOB_MAX_ATTEMPTS} attempts"
+            )
+        )
+        db.commit()
+        if result.rowcount == 1:
+            print(f"❌ Job {job_id} failed: lease expired after {JOB_MAX_ATTEMPTS} attempts")
+            clean_temp_files([file_path])
+
+def claim_jobs(limit):
+    """
+    Claim up to `limit` jobs for this process, oldest first. Each claim is a conditional
+    UPDATE, so when several processes race for the same job exactly one of them gets it.
+    """
+    now = time.time()
+    db = SessionLocal()
+    try:
+        _fail_exhausted_jobs(db, now)
+        candidates = db.execute(
+            select(UploadJob.id, UploadJob.status, UploadJob.lease_owner)
+            .where(_claimable(now))
+            .order_by(UploadJob.created_at)
+            .limit(limit * 2)
+        ).all()
+        # End the read transaction so each claim starts its own write transaction
+        db.rollback()
+
+        claimed = []
+        for job_id, status, previous_owner in candidates:
+            if len(claimed) >= limit:
+                break
+            result = db.execute(
+                update(UploadJob)
+                .where(UploadJob.id == job_id, _claimable(now))
+                .values(
+                    status="running", stage="queued", lease_owner=WORKER_ID,
+                    lease_expires_at=now + JOB_LEASE_SECONDS, attempts=UploadJob.attempts + 1,
+                    started_at=None
+                )
+            )
+            db.commit()
+            if result.rowcount == 1:
+                if status == "running":
+                    print(f"♻️ Job {job_id} reclaimed from unresponsive worker {previous_owner}")
+                claimed.append(job_id)
+        return claimed
+    finally:
+        db.close()
+
+def _renew_leases():
+    """Heartbeat: extend the lease of every job this process is working on."""
+    with _running_lock:
+        job_ids = list(_running)
+    if not job_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(UploadJob)
+            .where(UploadJob.id.in_(job_ids), UploadJob.lease_owner == WORKER_ID, UploadJob.status == "running")
+            .values(lease_expires_at=time.time() + JOB_LEASE_SECONDS)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def _prune_finished_jobs():
+    """Delete finished jobs older than JOB_RETENTION_SECONDS."""
+    db = SessionLocal()
+    try:
+        db.execute(delete(UploadJob).where(UploadJob.finished_at < time.time() - JOB_RETENTION_SECONDS))
+        db.commit()
+    finally:
+        db.close()
+
+def _run_upload_job(job_id):
+    """Convert, transcribe and store one claimed upload."""
+    db = SessionLocal()
+    job = db.get(UploadJob, job_id)
+    file_path = job.file_path
+    current_trace_id.set(job.trace_id)
+    started_at = time.time()
+    # The upload is removed once the job has an outcome; a job handed to another worker still needs it
+    finished = False
+    try:
+        _update_own_job(db, job_id, started_at=started_at)
+        db.commit()
+
+        cache_key = None
+        transcript_data = None
+        if job.content_hash:
+            cache_key = transcription_cache_key(job.content_hash, job.language, job.word_boost)
+            transcript_data = get_cached_transcription(db, cache_key)
+
+        cache_hit = transcript_data is not None
+        if transcript_data is None:
+            transcript_data = transcribe_file(
+                file_path, word_boost=job.word_boost, language=job.language,
+                on_stage=lambda stage: _set_stage(job_id, stage)
+            )
+
+            if cache_key:
+                store_transcription(db, cache_key, job.content_hash, transcript_data)
+
+        _set_stage(job_id, "saving")
+        transcription = Transcription(
+            filename=job.filename,
+            transcript=transcript_data["text"],
+            speakers=transcript_data["speakers"]
+        )
+        db.add(transcription)
+        db.flush()
+        save_utterances(
+            db, transcription.id,
+            transcript_data.get("utterances") or parse_utterances(transcript_data["text"])
+        )
+        # The transcript and the job's completion commit together, and only while this
+        # process still owns the job, so a reclaimed job cannot be saved twice
+        finished_at = time.time()
+        owned = _update_own_job(
+            db, job_id, status="completed", stage="completed", cache_hit=cache_hit,
+            transcription_id=transcription.id, finished_at=finished_at,
+            silence_removed_seconds=transcript_data.get("silence_removed_seconds"),
+            lease_owner=None, lease_expires_at=None
+        )
+        if not owned:
+            db.rollback()
+            print(f"⚠️ Job {job_id} lost its lease to another worker; discarding this result")
+            return
+        with stage_timer("db_commit"):
+            db.commit()
+        finished = True
+
+        print(f"✅ Job {job_id} completed in {finished_at - started_at:.1f}s")
+    except Exception as e:
+        db.rollback()
+        finished = _update_own_job(
+            db, job_id, status="failed", error=str(e), finished_at=time.time(),
+            lease_owner=None, lease_expires_at=None
+        )
+        db.commit()
+        print(f"❌ Job {job_id} failed: {e}")
+    finally:
+        db.close()
+        if finished:
+            clean_temp_files([file_path])
+        with _running_lock:
+            _running.pop(job_id, None)
+        _wake.set()
+
+def _dispatch_loop():
+    """Claim jobs while there are free worker threads, renew leases and prune old jobs."""
+    last_heartbeat = last_prune = 0.0
+    while not _stop.is_set():
+        now = time.time()
+        try:
+            if now - last_heartbeat >= JOB_HEARTBEAT_SECONDS:
+                _renew_leases()
+                last_heartbeat = now
+            if now - last_prune >= _PRUNE_INTERVAL_SECONDS:
+                _prune_finished_jobs()
+                last_prune = now
+            with _running_lock:
+                free = JOB_WORKERS - len(_running)
+            if free > 0:
+                for job_id in claim_jobs(free):
+                    with _running_lock:
+                        _running[job_id] = _executor.submit(_run_upload_job, job_id)
+        except Exception as e:
+            print(f"⚠️ Job dispatcher error: {e}")
+        _wake.wait(JOB_POLL_SECONDS)
+        _wake.clear()
+
+def start_workers():
+    """Start this process's worker pool and the dispatcher thread that feeds it from the job table."""
+    global _executor, _dispatcher
+    if _dispatcher is not None:
+        return
+    _stop.clear()
+    _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="upload-job")
+    _dispatcher = threading.Thread(target=_dispatch_loop, name="job-dispatcher", daemon=True)
+    _dispatcher.start()
+    print(f"👷 Job worker {WORKER_ID} started with {JOB_WORKERS} threads")
+
+def submit_upload_job(filename, file_path, size=None, content_hash=None, language="auto", word_boost="",
+                      trace_id=None):
+    """Queue an uploaded file for background processing by any worker and return the job as a dict."""
+    job = UploadJob(
+        id=uuid.uuid4().hex, filename=filename, file_path=file_path, size_bytes=size,
+        content_hash=content_hash, language=language, word_boost=word_boost, trace_id=trace_id,
+        status="queued", stage="queued", cache_hit=False, attempts=0, created_at=time.time()
+    )
+    db = SessionLocal()
+    try:
+        db.add(job)
+        db.commit()
+        job_dict = job_to_dict(job)
+    finally:
+        db.close()
+    _wake.set()
+    return job_dict
+
+def get_job(job_id):
+    """Return the job with the given id as a dict, or None if it is unknown."""
+    db = SessionLocal()
+    try:
+        job = db.get(UploadJob, job_id)
+        return job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+def job_counts():
+    """Return the number of jobs per status."""
+    counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+    db = SessionLocal()
+    try:
+        for status, count in db.execute(select(UploadJob.status, func.count()).group_by(UploadJob.status)):
+            counts[status] = count
+    finally:
+        db.close()
+    return counts
+
+def shutdown_workers(wait=False):
+    """
+    Stop claiming jobs and optionally wait for running ones. Jobs that were claimed but had
+    not started are handed back to the queue straight away instead of waiting for the lease.
+    """
+    global _executor, _dispatcher
+    if _dispatcher is None:
+        return
+    _stop.set()
+    _wake.set()
+    _dispatcher.join()
+    _executor.shutdown(wait=wait, cancel_futures=True)
+    with _running_lock:
+        cancelled = [job_id for job_id, future in _running.items() if future.cancelled()]
+        for job_id in cancelled:
+            del _running[job_id]
+    if cancelled:
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(UploadJob)
+                .where(UploadJob.id.in_(cancelled), UploadJob.lease_owner == WORKER_ID)
+                .values(status="queued", lease_owner=None, lease_expires_at=None, attempts=UploadJob.attempts - 1)
+            )
+            db.commit()
+        finally:
+            db.close()
+    _executor = _dispatcher = None
@@ -0,0 +1,309 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from types import SimpleNamespace
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+from metrics import LLM_TOKENS, stage_timer
+
+# Which LLM backend to use: "openai" (any OpenAI-compatible API) or "fake" (local, no network)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+
+# API Configuration
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "openai_api_key")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+TEXT_MODEL_NAME = os.getenv("TEXT_MODEL_NAME", "gemini/gemini-2.0-flash")
+
+# Connection pool and concurrency limits
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_CONCURRENCY_PER_MODEL = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "4"))
+
+# Retry policy for 429 / 5xx / connection errors
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30.0"))
+
+# The readiness probe makes one attempt and gives up after this many seconds
+LLM_CHECK_TIMEOUT = float(os.getenv("LLM_CHECK_TIMEOUT", "5"))
+
+# Fake backend: delay before the first token, response length in words, and streaming pace
+FAKE_LLM_LATENCY_SECONDS = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0.5"))
+FAKE_LLM_OUTPUT_TOKENS = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "300"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))  # 0 = no pacing
+
+_stats = {
+    "requests": 0,
+    "retries": 0,
+    "failures": 0,
+    "in_flight": 0,
+    "queue_wait_seconds_total": 0.0,
+    "queue_wait_seconds_max": 0.0,
+}
+_stats_lock = threading.Lock()
+
+def llm_stats():
+    """Return a snapshot of request, retry and queue-wait counters."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["queue_wait_seconds_avg"] = (
+        stats["queue_wait_seconds_total"] / stats["requests"] if stats["requests"] else 0.0
+    )
+    return stats
+
+def _record(**changes):
+    with _stats_lock:
+        for name, value in changes.items():
+            _stats[name] += value
+
+def _record_queue_wait(seconds):
+    with _stats_lock:
+        _stats["queue_wait_seconds_total"] += seconds
+        _stats["queue_wait_seconds_max"] = max(_stats["queue_wait_seconds_max"], seconds)
+
+def is_configured():
+    """True if an OpenAI-compatible API key has been provided, or the fake backend is in use."""
+    if LLM_PROVIDER == "fake":
+        return True
+    return bool(OPENAI_API_KEY) and OPENAI_API_KEY != "openai_api_key"
+
+def ensure_configured():
+    """Raise a descriptive error if the LLM API key is missing."""
+    if not is_configured():
+        raise RuntimeError(
+            f"OpenAI client is not initialized. Please check your configuration:\n"
+            f"- OPENAI_API_KEY: NOT SET\n"
+            f"- OPENAI_BASE_URL: {OPENAI_BASE_URL}\n"
+            f"- TEXT_MODEL_NAME: {TEXT_MODEL_NAME}"
+        )
+
+class FakeChatCompletions:
+    """
+    Stand-in for client.chat.completions that answers locally.
+    Responses are FAKE_LLM_OUTPUT_TOKENS words (capped by max_tokens), delivered after
+    FAKE_LLM_LATENCY_SECONDS and, when streaming, paced at FAKE_LLM_TOKENS_PER_SECOND.
+    """
+
+    def __init__(self, latency_seconds=FAKE_LLM_LATENCY_SECONDS, output_tokens=FAKE_LLM_OUTPUT_TOKENS,
+                 tokens_per_second=FAKE_LLM_TOKENS_PER_SECOND):
+        self.latency_seconds = latency_seconds
+        self.output_tokens = output_tokens
+        self.tokens_per_second = tokens_per_second
+
+    def _words(self, max_tokens=None):
+        count = min(self.output_tokens, max_tokens) if max_tokens else self.output_tokens
+        return [f"word{n}" for n in range(count)]
+
+    async def create(self, model, messages, stream=False, max_tokens=None, **kwargs):
+        await asyncio.sleep(self.latency_seconds)
+        words = self._words(max_tokens)
+        if stream:
+            return self._stream(words)
+        message = SimpleNamespace(role="assistant", content=" ".join(words))
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=len(words),
+                total_tokens=prompt_tokens + len(words)
+            )
+        )
+
+    async def _stream(self, words):
+        delay = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        for n, word in enumerate(words):
+            if delay:
+                await asyncio.sleep(delay)
+            delta = SimpleNamespace(content=word if n == 0 else f" {word}")
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+
+class FakeAsyncClient:
+    """Minimal AsyncOpenAI look-alike exposing only chat.completions.create."""
+
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(**kwargs))
+
+def _create_client():
+    """Build the client for LLM_PROVIDER: a pooled AsyncOpenAI, or the local fake."""
+    if LLM_PROVIDER == "fake":
+        return FakeAsyncClient()
+    if LLM_PROVIDER != "openai":
+        raise ValueError(f"Unknown LLM provider: {LLM_PROVIDER}")
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS
+        ),
+        timeout=LLM_TIMEOUT
+    )
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        timeout=LLM_TIMEOUT,
+        max_retries=0,  # retries are handled here, with jitter
+        http_client=http_client
+    )
+
+class _LoopState:
+    """Client and semaphores bound to one event loop."""
+
+    def __init__(self):
+        self.client = _create_client()
+        self.global_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        self.model_semaphores = {}
+
+    def model_semaphore(self, model):
+        if model not in self.model_semaphores:
+            self.model_semaphores[model] = asyncio.Semaphore(LLM_MAX_CONCURRENCY_PER_MODEL)
+        return self.model_semaphores[model]
+
+# asyncio primitives and pooled connections cannot be shared across event loops
+_loop_states = weakref.WeakKeyDictionary()
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _loop_states.get(loop)
+    if state is None:
+        state = _LoopState()
+        _loop_states[loop] = state
+    return state
+
+def get_async_client():
+    """Return the pooled AsyncOpenAI client for the running event loop."""
+    return _state().client
+
+def _is_retryable(error):
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+def _backoff_delay(attempt, error):
+    """Exponential backoff with full jitter, honouring a Retry-After header when present."""
+    retry_after = None
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after", ""))
+        except ValueError:
+            retry_after = None
+    if retry_after is not None:
+        return min(retry_after, LLM_BACKOFF_MAX)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+async def _acquire(model):
+    """Wait for a global and a per-model slot, recording how long the wait took."""
+    state = _state()
+    queued_at = time.monotonic()
+    await state.global_semaphore.acquire()
+    try:
+        await state.model_semaphore(model).acquire()
+    except BaseException:
+        state.global_semaphore.release()
+        raise
+    _record_queue_wait(time.monotonic() - queued_at)
+    return state
+
+def _release(state, model):
+    state.model_semaphore(model).release()
+    state.global_semaphore.release()
+
+def _record_usage(model, usage):
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, type="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, type="completion")
+
+async def chat_completion(messages, model=TEXT_MODEL_NAME, **kwargs):
+    """
+    Run one chat completion with concurrency limiting and retries.
+    Returns the full response object.
+    """
+    ensure_configured()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        state = await _acquire(model)
+        _record(requests=1, in_flight=1)
+        try:
+            with stage_timer("llm_request"):
+                response = await state.client.chat.completions.create(model=model, messages=messages, **kwargs)
+            _record_usage(model, getattr(response, "usage", None))
+            return response
+        except Exception as e:
+            if not _is_retryable(e) or attempt == LLM_MAX_RETRIES:
+                _record(failures=1)
+                raise
+            error = e
+        finally:
+            _record(in_flight=-1)
+            _release(state, model)
+
+        delay = _backoff_delay(attempt, error)
+        _record(retries=1)
+        print(f"⚠️ LLM request failed ({error}), retrying in {delay:.1f}s (attempt {attempt + 1}/{LLM_MAX_RETRIES})")
+        await asyncio.sleep(delay)
+
+async def stream_chat_completion(messages, model=TEXT_MODEL_NAME, **kwargs):
+    """
+    Stream a chat completion, yielding text deltas.
+    Only opening the stream is retried; once tokens have been sent a failure is raised.
+    Streams carry no usage block, so completion tokens are counted one per delta.
+    """
+    ensure_configured()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        state = await _acquire(model)
+        _record(requests=1, in_flight=1)
+        try:
+            try:
+                stream = await state.client.chat.completions.create(
+                    model=model, messages=messages, stream=True, **kwargs
+                )
+            except Exception as e:
+                if not _is_retryable(e) or attempt == LLM_MAX_RETRIES:
+                    _record(failures=1)
+                    raise
+                error = e
+            else:
+                deltas = 0
+                try:
+                    with stage_timer("llm_stream"):
+                        async for chunk in stream:
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                deltas += 1
+                                yield chunk.choices[0].delta.content
+                finally:
+                    LLM_TOKENS.inc(deltas, model=model, type="completion")
+                return
+        finally:
+            _record(in_flight=-1)
+            _release(state, model)
+
+        delay = _backoff_delay(attempt, error)
+        _record(retries=1)
+        print(f"⚠️ LLM stream failed to open ({error}), retrying in {delay:.1f}s (attempt {attempt + 1}/{LLM_MAX_RETRIES})")
+        await asyncio.sleep(delay)
+
+async def check_connectivity():
+    """
+    Connectivity check for the readiness probe: a one-token completion against TEXT_MODEL_NAME.
+    A single attempt that bypasses the retries and concurrency limits of chat_completion,
+    so a slow or rate-limited provider fails the probe within LLM_CHECK_TIMEOUT.
+    """
+    ensure_configured()
+    try:
+        await asyncio.wait_for(
+            get_async_client().chat.completions.create(
+                model=TEXT_MODEL_NAME, messages=[{"role": "user", "content": "Test"}], max_tokens=1
+            ),
+            LLM_CHECK_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"LLM did not respond within {LLM_CHECK_TIMEOUT:g}s")
@@ -1,23 +1,58 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse, JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import text, func, or_, and_, update, bindparam
+from sqlalchemy.orm import load_only
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from typing import List, Optional
 import os
-import tempfile
+import json
+import re
+import base64
+import hashlib
+import time
+import asyncio
 import signal
 import sys
 from datetime import datetime
+from urllib.parse import quote
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from models import get_db, Transcription
-from services import convert_to_mp3, transcribe_audio, summarize_meeting, save_summary_as_markdown
+from models import get_db, SessionLocal, Transcription, Utterance, next_version
+from services import (
+    summarize_meeting, stream_summarize_meeting, iter_summary_markdown, iter_markdown_zip, stream_multipart_upload,
+    UploadTooLargeError, InvalidUploadError, TokenBudgetExceeded, MAX_UPLOAD_SIZE, TEXT_MODEL_NAME
+)
+from transcribers import get_transcriber
+from uploads import (
+    UploadSessionError, UploadSessionNotFound, create_upload_session, get_upload_session, write_chunk,
+    finalize_upload_session, delete_upload_session, expire_upload_sessions
+)
+from jobs import submit_upload_job, get_job, job_counts, start_workers, shutdown_workers
+from cache import (
+    cache_stats, summary_cache_key, get_cached_summary, store_summary, store_summaries,
+    get_section_notes, store_section_notes
+)
+from search import search_transcriptions
+from utterances import (
+    parse_utterances, save_utterances, replace_utterances, reconcile_utterances, get_utterances,
+    count_utterances, rename_speaker, utterance_to_dict
+)
+from llm import llm_stats, check_connectivity as check_llm_connectivity
+from compression import CompressionMiddleware, etag_matches
+from metrics import MetricsMiddleware, JOBS, current_trace_id, render_metrics, stage_timer
 
 app = FastAPI(title="Summeet API", version="1.0.0")
 
+# Allowance for multipart boundaries and headers when pre-checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -25,62 +60,216 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# gzip/brotli for JSON and text responses above COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency, in-flight requests and optional trace IDs
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+def start_job_workers():
+    """Start claiming upload jobs from the shared job table"""
+    start_workers()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    """Stop the upload worker pool when the server shuts down"""
+    shutdown_workers(wait=False)
+
 @app.get("/")
 async def root():
     return {"message": "Summeet API", "version": "1.0.0"}
 
-@app.post("/upload")
-async def upload_audio(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    """Upload and transcribe audio file"""
+# Readiness results are reused for a while so frequent probes don't each make paid API calls
+READINESS_CACHE_SECONDS = int(os.getenv("READINESS_CACHE_SECONDS", "30"))
+_readiness_cache = {"checked_at": 0.0, "body": None, "status_code": 200}
+
+def check_transcription():
+    """Connectivity check for the readiness probe: the configured transcription backend"""
+    get_transcriber().check()
+
+def check_database():
+    """Connectivity check for the readiness probe: run a trivial query"""
+    db = SessionLocal()
     try:
-        # Save uploaded file temporarily and check size
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as tmp_file:
-            content = await file.read()
-            
-            # Check file size (limit: 100MB)
-            MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB in bytes
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(status_code=413, detail="File too large. Maximum size is 100MB.")
-            
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-
-        # Convert to MP3
-        mp3_path = convert_to_mp3(tmp_file_path)
-        
-        # Transcribe audio
-        transcript_data = transcribe_audio(mp3_path)
-        
-        # Save to database
-        transcription = Transcription(
-            filename=file.filename,
-            transcript=transcript_data["text"],
-            speakers=transcript_data["speakers"]
+        db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+
+async def _run_check(check):
+    try:
+        if asyncio.iscoroutinefunction(check):
+            await check()
+        else:
+            await run_in_threadpool(check)
+        return "ok"
+    except Exception as e:
+        return f"error: {e}"
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: checks database, LLM and transcription connectivity (makes live API calls)"""
+    now = time.monotonic()
+    if _readiness_cache["body"] is None or now - _readiness_cache["checked_at"] > READINESS_CACHE_SECONDS:
+        database, llm, transcription = await asyncio.gather(
+            _run_check(check_database),
+            _run_check(check_llm_connectivity),
+            _run_check(check_transcription)
         )
-        db.add(transcription)
-        db.commit()
-        db.refresh(transcription)
-        
-        # Cleanup temporary files
-        os.unlink(tmp_file_path)
-        os.unlink(mp3_path)
-        
-        return {
-            "id": transcription.id,
-            "filename": transcription.filename,
-            "transcript": transcription.transcript,
-            "speakers": transcription.speakers,
-            "created_at": transcription.created_at
-        }
+        checks = {"database": database, "llm": llm, "transcription": transcription}
+        ready = all(result == "ok" for result in checks.values())
+        _readiness_cache.update(
+            checked_at=now,
+            body={"ready": ready, "checks": checks},
+            status_code=200 if ready else 503
+        )
+    return JSONResponse(_readiness_cache["body"], status_code=_readiness_cache["status_code"])
+
+# Documents the form that upload_audio parses by hand
+_UPLOAD_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "file": {"type": "string", "format": "binary"},
+                "language": {"type": "string", "default": "auto"},
+                "word_boost": {"type": "string", "default": ""},
+            },
+        }}},
+    }
+}
+
+@app.post("/upload", status_code=202, openapi_extra=_UPLOAD_FORM_SCHEMA)
+async def upload_audio(request: Request):
+    """Upload audio file and queue it for background transcription"""
+    # Reject oversized requests before reading any of the body
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {MAX_UPLOAD_SIZE // (1024 * 1024)}MB.")
+
+    try:
+        # Parse the form as it arrives instead of letting FastAPI spool it first: the file
+        # goes to disk once and the size limit holds even without a Content-Length
+        filename, tmp_file_path, size, content_hash, fields = await stream_multipart_upload(
+            request.stream(), request.headers.get("content-type")
+        )
+
+        # Conversion and transcription run in the worker pool
+        job = submit_upload_job(
+            filename, tmp_file_path, size=size, content_hash=content_hash,
+            language=fields.get("language", "auto"), word_boost=fields.get("word_boost", ""),
+            trace_id=current_trace_id.get()
+        )
+        return job
         
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.on_event("startup")
+def clean_stale_upload_sessions():
+    expire_upload_sessions()
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int
+    chunk_size: Optional[int] = None
+    language: str = "auto"
+    word_boost: str = ""
+
+def _load_upload_session(upload_id):
+    try:
+        return get_upload_session(upload_id)
+    except UploadSessionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/uploads", status_code=201)
+async def create_resumable_upload(request: UploadSessionRequest):
+    """Start a resumable upload; the response says how to cut the file into chunks"""
+    try:
+        session = create_upload_session(
+            request.filename, request.size, chunk_size=request.chunk_size,
+            language=request.language, word_boost=request.word_boost
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return session.to_dict()
+
+@app.get("/uploads/{upload_id}")
+async def get_resumable_upload(upload_id: str):
+    """Get which chunks of a resumable upload have been received"""
+    return _load_upload_session(upload_id).to_dict()
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def put_upload_chunk(upload_id: str, index: int, request: Request):
+    """Upload one chunk (raw request body); chunks may arrive in any order and in parallel"""
+    session = _load_upload_session(upload_id)
+    try:
+        written = await write_chunk(session, index, request.stream())
+    except UploadSessionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"upload_id": upload_id, "index": index, "size_bytes": written}
+
+@app.post("/uploads/{upload_id}/complete", status_code=202)
+async def complete_resumable_upload(upload_id: str):
+    """Assemble a fully received upload and queue it for transcription, like POST /upload"""
+    session = _load_upload_session(upload_id)
+    try:
+        file_path, size, content_hash = await run_in_threadpool(finalize_upload_session, session)
+    except UploadSessionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadSessionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    job = submit_upload_job(
+        session.meta["filename"], file_path, size=size, content_hash=content_hash,
+        language=session.meta["language"], word_boost=session.meta["word_boost"],
+        trace_id=current_trace_id.get()
+    )
+    return job
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+async def abort_resumable_upload(upload_id: str):
+    """Abort a resumable upload and discard the chunks received so far"""
+    delete_upload_session(_load_upload_session(upload_id))
+
+@app.get("/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    """Get status and progress of a background upload job"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss counters for the result caches"""
+    return cache_stats()
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    """Get LLM request, retry and queue-wait counters"""
+    return llm_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: per-stage latency histograms, counters and in-flight gauges"""
+    for status, count in job_counts().items():
+        JOBS.set(count, status=status)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 class DirectTranscriptRequest(BaseModel):
     filename: str
     transcript: str
@@ -100,7 +289,10 @@ async def save_direct_transcript(
             speakers=request.speakers
         )
         db.add(transcription)
-        db.commit()
+        db.flush()
+        save_utterances(db, transcription.id, parse_utterances(request.transcript))
+        with stage_timer("db_commit"):
+            db.commit()
         db.refresh(transcription)
         
         return {
@@ -114,92 +306,535 @@ async def save_direct_transcript(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def encode_cursor(created_at, transcription_id):
+    """Opaque keyset cursor for the (created_at, id) position of a row"""
+    raw = f"{created_at.isoformat() if created_at else ''}|{transcription_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        created_at, transcription_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(transcription_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/transcriptions")
+async def list_transcriptions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    filename: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """List transcriptions newest first, without loading transcript or summary bodies"""
+    query = db.query(
+        Transcription,
+        func.length(Transcription.transcript).label("transcript_length"),
+        Transcription.summary.isnot(None).label("has_summary")
+    ).options(load_only(Transcription.id, Transcription.filename, Transcription.created_at))
+
+    if filename:
+        # autoescape makes %, _ and / in the filter match literally
+        query = query.filter(Transcription.filename.icontains(filename, autoescape=True))
+    if created_after:
+        query = query.filter(Transcription.created_at >= created_after)
+    if created_before:
+        query = query.filter(Transcription.created_at < created_before)
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Transcription.created_at < cursor_created_at,
+            and_(Transcription.created_at == cursor_created_at, Transcription.id < cursor_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(Transcription.created_at.desc(), Transcription.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+
+    items = [
+        {
+            "id": transcription.id,
+            "filename": transcription.filename,
+            "created_at": transcription.created_at,
+            "transcript_length": transcript_length or 0,
+            "has_summary": bool(has_summary)
+        }
+        for transcription, transcript_length, has_summary in page
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1][0]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over transcripts, summaries and filenames, best matches first"""
+    hits, has_more = search_transcriptions(db, q, limit=limit, offset=offset)
+    return {
+        "items": hits,
+        "next_offset": offset + limit if has_more else None
+    }
+
+# Columns GET /transcription/{id} can return; ?fields= selects a subset
+TRANSCRIPTION_FIELDS = ("id", "filename", "transcript", "speakers", "summary", "created_at")
+
+def parse_fields(fields):
+    """Validate a comma-separated ?fields= value; returns the selected fields in canonical order"""
+    if not fields:
+        return TRANSCRIPTION_FIELDS
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - set(TRANSCRIPTION_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(TRANSCRIPTION_FIELDS)}"
+        )
+    return tuple(field for field in TRANSCRIPTION_FIELDS if field in selected)
+
+def transcription_etag(transcription_id, version, fields):
+    """Strong ETag: changes with every write to the row, and differs per field selection"""
+    fields_tag = hashlib.sha256(",".join(fields).encode()).hexdigest()[:8]
+    return f'"t{transcription_id}-v{version or 0}-{fields_tag}"'
+
 @app.get("/transcription/{transcription_id}")
 async def get_transcription(
     transcription_id: int,
+    request: Request,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get transcription by ID"""
-    transcription = db.query(Transcription).filter(Transcription.id == transcription_id).first()
-    if not transcription:
+    """Get transcription by ID; ?fields=summary,speakers loads and returns only those columns"""
+    selected = parse_fields(fields)
+
+    # Revalidation only needs the row version, not the (possibly multi-megabyte) columns
+    version = db.query(Transcription.version).filter(Transcription.id == transcription_id).first()
+    if not version:
         raise HTTPException(status_code=404, detail="Transcription not found")
-    
+    etag = transcription_etag(transcription_id, version[0], selected)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    row = db.query(
+        Transcription.version, *(getattr(Transcription, field) for field in selected)
+    ).filter(Transcription.id == transcription_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+
+    return JSONResponse(
+        jsonable_encoder({field: getattr(row, field) for field in selected}),
+        # The version read with the data, in case the row changed since the first query
+        headers={"ETag": transcription_etag(transcription_id, row.version, selected), "Cache-Control": "no-cache"}
+    )
+
+def parse_speaker_table(speakers):
+    """Convert the stored speakers JSON into the [name, description] rows summarize_meeting expects"""
+    if not speakers:
+        return None
+    try:
+        speakers_data = json.loads(speakers)
+        return [[s.get('speaker', 'Unknown'), s.get('description', '')] for s in speakers_data]
+    except json.JSONDecodeError:
+        return None
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/transcription/{transcription_id}/utterances")
+async def list_utterances(
+    transcription_id: int,
+    start_ms: Optional[int] = Query(None, ge=0),
+    end_ms: Optional[int] = Query(None, ge=0),
+    from_idx: Optional[int] = Query(None, ge=0),
+    to_idx: Optional[int] = Query(None, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Get utterances by time window (start_ms/end_ms) and/or index range (from_idx/to_idx)"""
+    if not db.query(Transcription.id).filter(Transcription.id == transcription_id).first():
+        raise HTTPException(status_code=404, detail="Transcription not found")
+
+    utterances = get_utterances(
+        db, transcription_id,
+        start_ms=start_ms, end_ms=end_ms, from_idx=from_idx, to_idx=to_idx, limit=limit
+    )
     return {
-        "id": transcription.id,
-        "filename": transcription.filename,
-        "transcript": transcription.transcript,
-        "speakers": transcription.speakers,
-        "summary": transcription.summary,
-        "created_at": transcription.created_at
+        "total": count_utterances(db, transcription_id),
+        "items": [utterance_to_dict(u) for u in utterances]
     }
 
+class SpeakerRenameRequest(BaseModel):
+    name: str
+
+@app.put("/transcription/{transcription_id}/speakers/{speaker}")
+async def update_speaker_name(
+    transcription_id: int,
+    speaker: str,
+    request: SpeakerRenameRequest,
+    db: Session = Depends(get_db)
+):
+    """Rename a speaker across the utterances, transcript text and speaker table"""
+    transcription = db.query(Transcription).options(
+        load_only(Transcription.id, Transcription.speakers)
+    ).filter(Transcription.id == transcription_id).first()
+    if not transcription:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+
+    new_name = request.name.strip()
+    if not new_name or ":" in new_name or "\n" in new_name:
+        raise HTTPException(status_code=400, detail="Speaker name must be non-empty and contain no ':' or newlines")
+
+    renamed = rename_speaker(db, transcription, speaker, new_name)
+    db.commit()
+    return {"speaker": new_name, "utterances_renamed": renamed}
+
+class TranscriptUpdateRequest(BaseModel):
+    transcript: str
+    speakers: Optional[str] = None
+
+@app.put("/transcription/{transcription_id}")
+async def update_transcript(
+    transcription_id: int,
+    request: TranscriptUpdateRequest,
+    db: Session = Depends(get_db)
+):
+    """Save an edited transcript (and optionally the speaker table), keeping timestamps of unchanged utterances"""
+    transcription = db.query(Transcription).options(
+        load_only(Transcription.id, Transcription.transcript, Transcription.speakers)
+    ).filter(Transcription.id == transcription_id).first()
+    if not transcription:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+
+    if request.speakers is not None:
+        try:
+            json.loads(request.speakers)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="speakers must be a JSON string")
+
+    transcript_changed = request.transcript != transcription.transcript
+    if transcript_changed:
+        old_utterances = db.query(Utterance).filter(
+            Utterance.transcription_id == transcription_id
+        ).order_by(Utterance.idx).all()
+        replace_utterances(
+            db, transcription_id, reconcile_utterances(old_utterances, parse_utterances(request.transcript))
+        )
+        transcription.transcript = request.transcript
+    if request.speakers is not None:
+        transcription.speakers = request.speakers
+    if transcript_changed or request.speakers is not None:
+        transcription.version = next_version()
+
+    with stage_timer("db_commit"):
+        db.commit()
+    return {"id": transcription_id, "transcript_changed": transcript_changed}
+
+# Meetings summarized at the same time by one batch request, and results per DB transaction
+SUMMARY_BATCH_CONCURRENCY = int(os.getenv("SUMMARY_BATCH_CONCURRENCY", "4"))
+SUMMARY_BATCH_COMMIT_SIZE = int(os.getenv("SUMMARY_BATCH_COMMIT_SIZE", "20"))
+SUMMARY_BATCH_MAX_ITEMS = int(os.getenv("SUMMARY_BATCH_MAX_ITEMS", "500"))
+
+class BatchSummaryRequest(BaseModel):
+    ids: List[int]
+    language: str = "en"
+    temperature: float = 0.8
+    force: bool = False
+    concurrency: Optional[int] = None
+
+def _commit_summaries(db, results):
+    """Write a group of (transcription_id, cache_key, summary) results in one transaction."""
+    if not results:
+        return
+    with stage_timer("db_commit"):
+        db.connection().execute(
+            update(Transcription.__table__)
+            .where(Transcription.id == bindparam("tid"))
+            .values(summary=bindparam("new_summary"), version=next_version()),
+            [{"tid": tid, "new_summary": summary} for tid, _, summary in results]
+        )
+        store_summaries(db, [(cache_key, summary) for _, cache_key, summary in results])
+        db.commit()
+
+# Declared before /summarize/{transcription_id} so "batch" is not taken for an ID
+@app.post("/summarize/batch")
+async def summarize_batch(request: BatchSummaryRequest):
+    """
+    Summarize many transcriptions with bounded concurrency, streaming one Server-Sent Event
+    per finished item and a final "done" event. Results are committed in groups.
+    """
+    ids = list(dict.fromkeys(request.ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No transcription IDs given")
+    if len(ids) > SUMMARY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {SUMMARY_BATCH_MAX_ITEMS} transcriptions per batch")
+    concurrency = max(1, min(request.concurrency or SUMMARY_BATCH_CONCURRENCY, SUMMARY_BATCH_CONCURRENCY))
+
+    async def event_stream():
+        batch_db = SessionLocal()
+        semaphore = asyncio.Semaphore(concurrency)
+        pending = []
+        counts = {"completed": 0, "cached": 0, "failed": 0, "not_found": 0}
+
+        async def summarize_one(transcription_id):
+            async with semaphore:
+                row = batch_db.query(Transcription.transcript, Transcription.speakers).filter(
+                    Transcription.id == transcription_id
+                ).first()
+                if row is None:
+                    return {"id": transcription_id, "status": "not_found"}, None
+
+                speaker_table = parse_speaker_table(row.speakers)
+                cache_key = summary_cache_key(row.transcript, speaker_table, request.language, request.temperature, TEXT_MODEL_NAME)
+                summary = None if request.force else get_cached_summary(batch_db, cache_key)
+                status = "cached" if summary is not None else "completed"
+                token_report = {}
+                if summary is None:
+                    summary = await summarize_meeting(
+                        row.transcript,
+                        speaker_table=speaker_table,
+                        system_prompt_language=request.language,
+                        temperature=request.temperature,
+                        report=token_report
+                    )
+                item = {"id": transcription_id, "status": status, "tokens": token_report or None}
+                return item, (transcription_id, cache_key, summary)
+
+        async def guarded(transcription_id):
+            try:
+                return await summarize_one(transcription_id)
+            except Exception as e:
+                return {"id": transcription_id, "status": "failed", "error": str(e)}, None
+
+        tasks = [asyncio.create_task(guarded(transcription_id)) for transcription_id in ids]
+        try:
+            for finished, next_task in enumerate(asyncio.as_completed(tasks), start=1):
+                item, result = await next_task
+                counts[item["status"]] += 1
+                if result:
+                    pending.append(result)
+                if len(pending) >= SUMMARY_BATCH_COMMIT_SIZE:
+                    _commit_summaries(batch_db, pending)
+                    pending = []
+                yield sse_event("item", dict(item, done=finished, total=len(ids)))
+
+            _commit_summaries(batch_db, pending)
+            pending = []
+            yield sse_event("done", dict(counts, total=len(ids)))
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            # Client went away or something failed: keep what is finished, drop the rest
+            for task in tasks:
+                task.cancel()
+            try:
+                _commit_summaries(batch_db, pending)
+            except Exception as e:
+                batch_db.rollback()
+                print(f"❌ Could not save {len(pending)} batch summaries: {e}")
+            finally:
+                batch_db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/summarize/{transcription_id}")
 async def create_summary(
     transcription_id: int,
     language: str = "en", 
     temperature: float = 0.8,
+    force: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Generate summary for transcription"""
+    """Generate summary for transcription (force=true bypasses the summary cache)"""
     transcription = db.query(Transcription).filter(Transcription.id == transcription_id).first()
     if not transcription:
         raise HTTPException(status_code=404, detail="Transcription not found")
     
     try:
-        # Parse speakers if available
-        speaker_table = None
-        if transcription.speakers:
-            try:
-                import json
-                speakers_data = json.loads(transcription.speakers)
-                # Convert to format expected by summarize_meeting
-                speaker_table = [[s.get('speaker', 'Unknown'), s.get('description', '')] for s in speakers_data]
-            except json.JSONDecodeError:
-                pass
+        speaker_table = parse_speaker_table(transcription.speakers)
         
-        # Generate summary with language and temperature parameters
-        summary = summarize_meeting(
-            transcription.transcript, 
-            speaker_table=speaker_table,
-            system_prompt_language=language,
-            temperature=temperature
-        )
+        # Reuse a previous summary when none of its inputs changed
+        cache_key = summary_cache_key(transcription.transcript, speaker_table, language, temperature, TEXT_MODEL_NAME)
+        summary = None if force else get_cached_summary(db, cache_key)
+        cached = summary is not None
+        token_report = {}
+
+        if not cached:
+            # Reuse the notes of long-transcript sections that did not change since the last run
+            previous_notes = get_section_notes(db, transcription_id)
+            section_notes = dict(previous_notes)
+
+            # Generate summary with language and temperature parameters
+            summary = await summarize_meeting(
+                transcription.transcript, 
+                speaker_table=speaker_table,
+                system_prompt_language=language,
+                temperature=temperature,
+                section_notes=section_notes,
+                report=token_report
+            )
+            store_section_notes(db, transcription_id, previous_notes, section_notes)
+            store_summary(db, cache_key, summary)
         
         # Update database
         transcription.summary = summary
-        db.commit()
+        transcription.version = next_version()
+        with stage_timer("db_commit"):
+            db.commit()
         
-        return {"summary": summary}
+        return {"summary": summary, "cached": cached, "tokens": token_report or None}
         
+    except TokenBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/summarize/{transcription_id}/stream")
+async def stream_summary(
+    transcription_id: int,
+    language: str = "en",
+    temperature: float = 0.8,
+    force: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Generate summary for transcription, streaming tokens as Server-Sent Events"""
+    transcription = db.query(Transcription).filter(Transcription.id == transcription_id).first()
+    if not transcription:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+
+    transcript = transcription.transcript
+    speaker_table = parse_speaker_table(transcription.speakers)
+    cache_key = summary_cache_key(transcript, speaker_table, language, temperature, TEXT_MODEL_NAME)
+    cached_summary = None if force else get_cached_summary(db, cache_key)
+    previous_notes = get_section_notes(db, transcription_id) if cached_summary is None else {}
+
+    async def event_stream():
+        stream_db = SessionLocal()
+        try:
+            token_report = {}
+            if cached_summary is not None:
+                summary = cached_summary
+                yield sse_event("delta", {"text": summary})
+            else:
+                parts = []
+                section_notes = dict(previous_notes)
+                async for delta in stream_summarize_meeting(
+                    transcript,
+                    speaker_table=speaker_table,
+                    system_prompt_language=language,
+                    temperature=temperature,
+                    section_notes=section_notes,
+                    report=token_report
+                ):
+                    parts.append(delta)
+                    yield sse_event("delta", {"text": delta})
+                summary = "".join(parts).strip() or "(Summary generation failed or produced empty result)"
+                store_section_notes(stream_db, transcription_id, previous_notes, section_notes)
+                store_summary(stream_db, cache_key, summary)
+
+            stream_db.query(Transcription).filter(Transcription.id == transcription_id).update(
+                {"summary": summary, "version": next_version()}, synchronize_session=False
+            )
+            with stage_timer("db_commit"):
+                stream_db.commit()
+            yield sse_event("done", {
+                "summary": summary, "cached": cached_summary is not None, "tokens": token_report or None
+            })
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _attachment_headers(filename):
+    """Content-Disposition for a download, RFC 5987-encoded when the name is not plain ASCII"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted}"}
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+def _export_title(transcription):
+    return transcription.filename or f"meeting_{transcription.id}"
+
+class BulkExportRequest(BaseModel):
+    ids: Optional[List[int]] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+@app.post("/export/bulk")
+async def export_bulk(request: BulkExportRequest, db: Session = Depends(get_db)):
+    """Download many meetings as a ZIP of Markdown files, streamed as it is built"""
+    query = db.query(Transcription.id)
+    if request.ids is not None:
+        query = query.filter(Transcription.id.in_(request.ids))
+    if request.created_after:
+        query = query.filter(Transcription.created_at >= request.created_after)
+    if request.created_before:
+        query = query.filter(Transcription.created_at < request.created_before)
+    ids = [transcription_id for (transcription_id,) in query.order_by(Transcription.created_at, Transcription.id)]
+    if not ids:
+        raise HTTPException(status_code=404, detail="No transcriptions match")
+
+    def meetings():
+        # Runs in the threadpool while the response streams, with its own session. One
+        # meeting is loaded at a time, so memory is bounded by the largest transcript.
+        session = SessionLocal()
+        try:
+            for transcription_id in ids:
+                transcription = session.get(Transcription, transcription_id)
+                if transcription is None:
+                    continue  # deleted since the export started
+                title = _export_title(transcription)
+                # Prefixed with the id so meetings with the same filename do not collide
+                safe_title = re.sub(r"[\\/]", "_", title)
+                yield (
+                    f"{transcription.id}_{safe_title}_summary.md",
+                    transcription.transcript, transcription.summary or "", title
+                )
+                # Drop the row and end the read transaction before loading the next one
+                session.expunge(transcription)
+                session.rollback()
+        finally:
+            session.close()
+
+    return StreamingResponse(
+        iter_markdown_zip(meetings()),
+        media_type="application/zip",
+        headers=_attachment_headers(f"meetings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+    )
+
 @app.get("/export/{transcription_id}")
 async def export_markdown(
     transcription_id: int,
     db: Session = Depends(get_db)
 ):
-    """Export transcription as markdown file"""
+    """Export transcription as markdown file, streamed without a temporary file"""
     transcription = db.query(Transcription).filter(Transcription.id == transcription_id).first()
     if not transcription:
         raise HTTPException(status_code=404, detail="Transcription not found")
-    
-    try:
-        # Generate markdown file
-        markdown_path = save_summary_as_markdown(
-            transcription.transcript,
-            transcription.summary or "",
-            transcription.filename or f"meeting_{transcription.id}"
-        )
-        
-        return FileResponse(
-            markdown_path,
-            media_type='text/markdown',
-            filename=f"{transcription.filename or f'meeting_{transcription.id}'}_summary.md"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    title = _export_title(transcription)
+    return StreamingResponse(
+        iter_summary_markdown(transcription.transcript, transcription.summary or "", title),
+        media_type="text/markdown",
+        headers=_attachment_headers(f"{title}_summary.md")
+    )
 
 def signal_handler(sig, frame):
     """Handle SIGINT (Ctrl+C) and SIGTERM signals"""
@@ -0,0 +1,247 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Attach a trace ID to every request (from X-Trace-Id, or generated) and log stage timings with it
+TRACE_IDS_ENABLED = os.getenv("TRACE_IDS_ENABLED", "false").lower() == "true"
+TRACE_HEADER = "X-Trace-Id"
+
+# Histogram buckets in seconds, from fast DB writes up to hour-long transcriptions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+_registry = []
+_registry_lock = threading.Lock()
+
+class _Metric:
+    """Base class for a labelled metric kept in process memory."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. bytes processed or errors."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in self._values.items()]
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. work currently in flight."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self):
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in self._values.items()]
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', repr(float(bound)))])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+def render_metrics():
+    """Render every registered metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Pipeline instrumentation shared by the upload, transcription and summary paths
+STAGE_DURATION = Histogram(
+    "summeet_stage_duration_seconds", "Time spent in each pipeline stage", ["stage"]
+)
+STAGE_IN_PROGRESS = Gauge(
+    "summeet_stage_in_progress", "Pipeline stages currently running", ["stage"]
+)
+STAGE_ERRORS = Counter(
+    "summeet_stage_errors_total", "Pipeline stages that raised an error", ["stage"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "summeet_http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "summeet_http_requests_in_progress", "HTTP requests currently being served", ["method"]
+)
+BYTES_PROCESSED = Counter(
+    "summeet_bytes_processed_total", "Bytes read or written by the pipeline", ["kind"]
+)
+AUDIO_SECONDS = Counter(
+    "summeet_audio_seconds_total", "Seconds of audio transcribed (cache hits excluded)"
+)
+SILENCE_REMOVED_SECONDS = Counter(
+    "summeet_silence_removed_seconds_total", "Seconds of silence trimmed before transcription"
+)
+LLM_TOKENS = Counter(
+    "summeet_llm_tokens_total", "LLM tokens used, as reported by the API", ["model", "type"]
+)
+COMPACTION_TOKENS = Counter(
+    "summeet_compaction_tokens_total", "Estimated transcript tokens before and after compaction", ["phase"]
+)
+CACHE_REQUESTS = Counter(
+    "summeet_cache_requests_total", "Cache lookups by result", ["cache", "result"]
+)
+JOBS = Gauge(
+    "summeet_jobs", "Upload jobs in the job table by status", ["status"]
+)
+
+# Trace ID of the request (or background job) the current code runs for
+current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and in-flight count per route. With TRACE_IDS_ENABLED,
+    it also takes the trace ID from the X-Trace-Id header (or generates one), makes it the
+    current trace for the request and echoes it back in the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = None
+        token = None
+        if TRACE_IDS_ENABLED:
+            headers = dict(scope.get("headers") or [])
+            trace_id = headers.get(TRACE_HEADER.lower().encode(), b"").decode("latin-1")[:64] or new_trace_id()
+            token = current_trace_id.set(trace_id)
+
+        status = {"code": 500}
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if trace_id:
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (TRACE_HEADER.lower().encode(), trace_id.encode("latin-1"))
+                    ])
+            await send(message)
+
+        method = scope["method"]
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc(method=method)
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec(method=method)
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=method, route=getattr(route, "path", "unmatched"), status=status["code"]
+            )
+            if token is not None:
+                current_trace_id.reset(token)
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Time one pipeline stage: observe its duration, count it as in flight while it runs
+    and count errors. With a trace ID set, the timing is also logged under that ID.
+    """
+    start = time.perf_counter()
+    STAGE_IN_PROGRESS.inc(stage=stage)
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_IN_PROGRESS.dec(stage=stage)
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        trace_id = current_trace_id.get()
+        if trace_id:
+            print(f"[trace {trace_id}] {stage} {'failed after' if failed else 'took'} {elapsed:.3f}s")
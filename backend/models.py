@@ -1,8 +1,13 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from sqlalchemy import (
+    create_engine, event, func, inspect, Column, Boolean, Integer, Float, String, Text, DateTime, Index, ForeignKey,
+    UniqueConstraint
+)
+from sqlalchemy.exc import DatabaseError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import os
+import time
 
 # Get data directory from environment variable, default to /app/data
 DATA_DIR = os.getenv("DATA_DIR", "/app/data")
@@ -10,10 +15,28 @@ DATA_DIR = os.getenv("DATA_DIR", "/app/data")
 # Ensure data directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# SQLite database configuration
-DATABASE_URL = f"sqlite:///{DATA_DIR}/database.db"
+# Database configuration: SQLite in DATA_DIR by default, or any SQLAlchemy URL
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DATA_DIR}/database.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# How long a SQLite connection waits for another process's write lock before failing
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        """WAL lets readers run alongside a writer, so several worker processes can share the file"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+else:
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -27,9 +50,173 @@ class Transcription(Base):
     speakers = Column(Text)  # JSON string
     summary = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped on every write (see next_version); ETags on the read path are derived from it
+    version = Column(Integer, nullable=True, default=1)
+
+    __table_args__ = (
+        # Keyset pagination for the listing endpoint
+        Index("ix_transcriptions_created_at_id", "created_at", "id"),
+    )
+
+def next_version():
+    """SQL expression for a transcription's next version; set it alongside every change to the row"""
+    return func.coalesce(Transcription.version, 0) + 1
+
+class Utterance(Base):
+    """One speaker turn of a transcription, with its position in the recording"""
+    __tablename__ = "utterances"
+
+    id = Column(Integer, primary_key=True)
+    transcription_id = Column(Integer, ForeignKey("transcriptions.id", ondelete="CASCADE"), nullable=False)
+    idx = Column(Integer, nullable=False)
+    speaker = Column(String)
+    start_ms = Column(Integer, nullable=True)
+    end_ms = Column(Integer, nullable=True)
+    text = Column(Text)
+    confidence = Column(Float, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("transcription_id", "idx", name="uq_utterances_transcription_idx"),
+        Index("ix_utterances_transcription_start", "transcription_id", "start_ms"),
+        Index("ix_utterances_transcription_speaker", "transcription_id", "speaker"),
+    )
+
+class TranscriptCacheEntry(Base):
+    """Cached transcription result keyed by audio hash and transcription config"""
+    __tablename__ = "transcript_cache"
+
+    cache_key = Column(String, primary_key=True)
+    content_hash = Column(String, index=True)
+    text = Column(Text)
+    speakers = Column(Text)  # JSON string
+    utterances = Column(Text, nullable=True)  # JSON string
+    size_bytes = Column(Integer, default=0)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class SummaryCacheEntry(Base):
+    """Cached summary keyed by transcript, speakers, language, temperature and model"""
+    __tablename__ = "summary_cache"
+
+    cache_key = Column(String, primary_key=True)
+    summary = Column(Text)
+    size_bytes = Column(Integer, default=0)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class SectionSummary(Base):
+    """Intermediate (map step) notes for one section of a long transcript, keyed by section fingerprint"""
+    __tablename__ = "section_summaries"
+
+    transcription_id = Column(Integer, ForeignKey("transcriptions.id", ondelete="CASCADE"), primary_key=True)
+    fingerprint = Column(String, primary_key=True)
+    notes = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UploadJob(Base):
+    """
+    Background upload job. Any worker process may claim a queued job; the claim is a lease
+    that the owner renews while it works, so jobs of a crashed worker are picked up again.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    filename = Column(String)
+    file_path = Column(String)
+    size_bytes = Column(Integer, nullable=True)
+    content_hash = Column(String, nullable=True)
+    language = Column(String, default="auto")
+    word_boost = Column(Text, default="")
+    trace_id = Column(String, nullable=True)
+    status = Column(String, default="queued")  # queued, running, completed, failed
+    stage = Column(String, default="queued")
+    error = Column(Text, nullable=True)
+    cache_hit = Column(Boolean, default=False)
+    transcription_id = Column(Integer, nullable=True)
+    silence_removed_seconds = Column(Float, nullable=True)
+    attempts = Column(Integer, default=0)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(Float, nullable=True)  # Unix time, like the other job timestamps
+    created_at = Column(Float)
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # Claiming scans queued jobs oldest first, and running jobs by lease expiry
+        Index("ix_jobs_status_created_at", "status", "created_at"),
+        Index("ix_jobs_status_lease_expires_at", "status", "lease_expires_at"),
+        Index("ix_jobs_finished_at", "finished_at"),
+    )
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+def _migrate():
+    """Add nullable columns and indexes that create_all skips on tables that already exist"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                    )
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+# Full-text search index over transcriptions (SQLite FTS5, external content).
+# Triggers keep it in sync with the transcriptions table on every write.
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transcriptions_fts USING fts5(
+        transcript, summary, filename,
+        content='transcriptions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS transcriptions_fts_insert AFTER INSERT ON transcriptions BEGIN
+        INSERT INTO transcriptions_fts(rowid, transcript, summary, filename)
+        VALUES (new.id, new.transcript, new.summary, new.filename);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transcriptions_fts_delete AFTER DELETE ON transcriptions BEGIN
+        INSERT INTO transcriptions_fts(transcriptions_fts, rowid, transcript, summary, filename)
+        VALUES ('delete', old.id, old.transcript, old.summary, old.filename);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transcriptions_fts_update
+    AFTER UPDATE OF transcript, summary, filename ON transcriptions BEGIN
+        INSERT INTO transcriptions_fts(transcriptions_fts, rowid, transcript, summary, filename)
+        VALUES ('delete', old.id, old.transcript, old.summary, old.filename);
+        INSERT INTO transcriptions_fts(rowid, transcript, summary, filename)
+        VALUES (new.id, new.transcript, new.summary, new.filename);
+    END""",
+]
+
+def _create_fts():
+    """Create the FTS5 index and triggers, indexing existing rows the first time"""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transcriptions_fts'"
+        ).first()
+        for statement in FTS_SCHEMA:
+            conn.exec_driver_sql(statement)
+        if not exists:
+            conn.exec_driver_sql("INSERT INTO transcriptions_fts(transcriptions_fts) VALUES ('rebuild')")
+
+def _create_schema():
+    Base.metadata.create_all(bind=engine)
+    _migrate()
+    _create_fts()
+
+# Worker processes started together race to create the schema; the losers find it in place on retry
+for _attempt in range(3):
+    try:
+        _create_schema()
+        break
+    except DatabaseError:
+        if _attempt == 2:
+            raise
+        time.sleep(0.5)
 
 def get_db():
     """Database dependency"""
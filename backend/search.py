@@ -0,0 +1,130 @@
+import html
+import re
+
+from sqlalchemy import text, and_, or_, DateTime
+
+from models import Transcription
+
+# Highlight markers wrapped around matched terms in snippets
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+SNIPPET_TOKENS = 24
+
+# snippet() marks matches with these private-use characters; they become the highlight
+# tags only after the text around them is HTML-escaped
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+
+# bm25 column weights: transcript, summary, filename
+RANK_WEIGHTS = (1.0, 2.0, 4.0)
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+def build_match_query(q):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    Every word must match; the last word also matches as a prefix so results update while typing.
+    """
+    terms = _TERM.findall(q or "")
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def search_transcriptions(db, q, limit=20, offset=0):
+    """
+    Ranked full-text search over transcript, summary and filename.
+    Returns (hits, has_more); each hit carries highlighted snippets as escaped HTML.
+    """
+    match = build_match_query(q)
+    if match is None:
+        return [], False
+    if db.get_bind().dialect.name != "sqlite":
+        return _search_without_fts(db, _TERM.findall(q), limit, offset)
+
+    rows = db.execute(text(f"""
+        SELECT t.id, t.filename, t.created_at,
+               snippet(transcriptions_fts, 0, :start, :end, '…', :tokens) AS transcript_snippet,
+               snippet(transcriptions_fts, 1, :start, :end, '…', :tokens) AS summary_snippet,
+               bm25(transcriptions_fts, {RANK_WEIGHTS[0]}, {RANK_WEIGHTS[1]}, {RANK_WEIGHTS[2]}) AS rank
+        FROM transcriptions_fts
+        JOIN transcriptions t ON t.id = transcriptions_fts.rowid
+        WHERE transcriptions_fts MATCH :match
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """).columns(created_at=DateTime), {
+        "match": match,
+        "start": _MARK_START,
+        "end": _MARK_END,
+        "tokens": SNIPPET_TOKENS,
+        "limit": limit + 1,
+        "offset": offset,
+    }).all()
+
+    hits = [
+        {
+            "id": row.id,
+            "filename": row.filename,
+            "created_at": row.created_at,
+            "transcript_snippet": _snippet_html(row.transcript_snippet),
+            "summary_snippet": _snippet_html(row.summary_snippet),
+            "score": -row.rank,  # bm25 is lower-is-better
+        }
+        for row in rows[:limit]
+    ]
+    return hits, len(rows) > limit
+
+def _snippet_html(snippet):
+    """Escape snippet text for HTML, then turn the match markers into highlight tags."""
+    if not snippet:
+        return snippet
+    return html.escape(snippet).replace(_MARK_START, HIGHLIGHT_START).replace(_MARK_END, HIGHLIGHT_END)
+
+def _highlight_snippet(value, terms):
+    """Up to SNIPPET_TOKENS words around the first matched term, with matches highlighted, like FTS5 snippet()."""
+    if not value:
+        return ""
+    words = value.split()
+    lowered = [term.lower() for term in terms]
+    first = next((i for i, word in enumerate(words) if any(term in word.lower() for term in lowered)), None)
+    if first is None:
+        return ""
+    start = max(0, first - SNIPPET_TOKENS // 2)
+    window = words[start:start + SNIPPET_TOKENS]
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    snippet = " ".join(window)
+    snippet = pattern.sub(lambda m: f"{_MARK_START}{m.group(0)}{_MARK_END}", snippet)
+    return _snippet_html(("…" if start > 0 else "") + snippet + ("…" if start + SNIPPET_TOKENS < len(words) else ""))
+
+def _search_without_fts(db, terms, limit, offset):
+    """
+    Fallback for databases without the SQLite FTS5 index: every term must appear (as a
+    substring, case-insensitively) in the transcript, summary or filename. There is no
+    relevance ranking, so hits come newest first; score counts weighted term occurrences.
+    """
+    columns = (Transcription.transcript, Transcription.summary, Transcription.filename)
+    rows = (
+        db.query(Transcription)
+        .filter(and_(*(or_(*(column.icontains(term, autoescape=True) for column in columns)) for term in terms)))
+        .order_by(Transcription.created_at.desc(), Transcription.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+
+    hits = []
+    for row in rows[:limit]:
+        values = (row.transcript or "", row.summary or "", row.filename or "")
+        hits.append({
+            "id": row.id,
+            "filename": row.filename,
+            "created_at": row.created_at,
+            "transcript_snippet": _highlight_snippet(row.transcript, terms),
+            "summary_snippet": _highlight_snippet(row.summary, terms),
+            "score": sum(
+                weight * value.lower().count(term.lower())
+                for weight, value in zip(RANK_WEIGHTS, values) for term in terms
+            ),
+        })
+    return hits, len(rows) > limit
@@ -1,69 +1,55 @@
 import os
 import tempfile
 import subprocess
+import hashlib
+import re
+import asyncio
+import threading
+import zipfile
+from contextlib import contextmanager
 import assemblyai as aai
-from openai import OpenAI
+from multipart.multipart import MultipartParser, parse_options_header
+from llm import (
+    TEXT_MODEL_NAME, chat_completion, stream_chat_completion, ensure_configured
+)
 from datetime import datetime
 import json
+from metrics import BYTES_PROCESSED, COMPACTION_TOKENS, stage_timer
+from compaction import COMPACTION_RULES, compact_transcript, estimate_tokens
 
 # API Configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "openai_api_key")
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY", "assemblyai_api_key")
-TEXT_MODEL_NAME = os.getenv("TEXT_MODEL_NAME", "gemini/gemini-2.0-flash")
 
-# Initialize clients
-client = None
-
-def initialize_openai_client():
-    """Initialize OpenAI client with proper error handling"""
-    global client
-    try:
-        if not OPENAI_API_KEY or OPENAI_API_KEY == "openai_api_key":
-            raise ValueError("OPENAI_API_KEY is not set or is using default value")
-        
-        client = OpenAI(
-            api_key=OPENAI_API_KEY, 
-            base_url=OPENAI_BASE_URL,
-            timeout=60.0  # 60 second timeout
-        )
-        
-        # Test the client with a simple request
-        try:
-            test_response = client.chat.completions.create(
-                model=TEXT_MODEL_NAME,
-                messages=[{"role": "user", "content": "Test"}],
-                max_tokens=5
-            )
-            print(f"✅ OpenAI client connection test successful")
-            print(f"✅ Initialized OpenAI client with base URL: {OPENAI_BASE_URL}")
-            print(f"✅ Using model: {TEXT_MODEL_NAME}")
-        except Exception as test_error:
-            print(f"⚠️ Client created but connection test failed: {test_error}")
-            print(f"✅ Initialized OpenAI client with base URL: {OPENAI_BASE_URL}")
-            print(f"✅ Using model: {TEXT_MODEL_NAME}")
-            # Still return True as the client was created successfully
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error initializing OpenAI client: {e}")
-        print(f"OPENAI_API_KEY set: {'Yes' if OPENAI_API_KEY and OPENAI_API_KEY != 'openai_api_key' else 'No'}")
-        print(f"OPENAI_BASE_URL: {OPENAI_BASE_URL}")
-        client = None
-        return False
-
-# Initialize OpenAI client
-initialize_openai_client()
-
-# Initialize AssemblyAI
-try:
-    aai.settings.api_key = ASSEMBLYAI_API_KEY
-    aai.settings.http_timeout = 900  # 15 minutes
-    print(f"✅ Initialized AssemblyAI client")
-    print(f"ASSEMBLYAI_API_KEY set: {'Yes' if ASSEMBLYAI_API_KEY and ASSEMBLYAI_API_KEY != 'assemblyai_api_key' else 'No'}")
-except Exception as e:
-    print(f"❌ Error initializing AssemblyAI: {e}")
+# Upload limits
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100MB in bytes
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB read/write chunks
+MAX_FORM_FIELDS_SIZE = 64 * 1024  # all text fields sent along with an uploaded file
+EXPORT_CHUNK_CHARS = 64 * 1024  # Markdown exports are streamed in pieces of this many characters
+
+# AssemblyAI is configured on first use, not at import time
+_assemblyai_configured = False
+_assemblyai_lock = threading.Lock()
+
+def configure_assemblyai():
+    """Apply AssemblyAI settings once, the first time transcription is needed."""
+    global _assemblyai_configured
+    if _assemblyai_configured:
+        return
+    with _assemblyai_lock:
+        if not _assemblyai_configured:
+            aai.settings.api_key = ASSEMBLYAI_API_KEY
+            aai.settings.http_timeout = 900  # 15 minutes
+            _assemblyai_configured = True
+            print(f"✅ Initialized AssemblyAI client")
+            print(f"ASSEMBLYAI_API_KEY set: {'Yes' if ASSEMBLYAI_API_KEY and ASSEMBLYAI_API_KEY != 'assemblyai_api_key' else 'No'}")
+
+def check_assemblyai():
+    """Connectivity check for the readiness probe: list one transcript with the configured key."""
+    configure_assemblyai()
+    http_client = aai.Client.get_default().http_client
+    response = http_client.get("/v2/transcript", params={"limit": 1})
+    if response.status_code != 200:
+        raise RuntimeError(f"AssemblyAI returned HTTP {response.status_code}")
 
 # System prompts for meeting summarization
 SYSTEM_PROMPTS = {
@@ -137,26 +123,228 @@ Follow the above requirements step by step. Return only the meeting minutes in t
 '''
 }
 
-def convert_to_mp3(input_file):
-    """Convert input audio file to MP3 using ffmpeg directly."""
+# Target audio sent to the transcription provider
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_CHANNELS = 1
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "mp3")  # "mp3" or "opus"
+
+AUDIO_FORMATS = {
+    "mp3": {"codec": "libmp3lame", "codec_name": "mp3", "container": "mp3", "suffix": ".mp3",
+            "bitrate": os.getenv("MP3_BITRATE", "64k")},
+    "opus": {"codec": "libopus", "codec_name": "opus", "container": "ogg", "suffix": ".ogg",
+             "bitrate": os.getenv("OPUS_BITRATE", "24k")},
+}
+
+def probe_audio(input_file):
+    """
+    Read codec, channel count, sample rate and duration of the first audio stream with ffprobe.
+    Returns None if the file cannot be probed.
+    """
+    command = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name,channels,sample_rate:format=duration',
+        '-of', 'json',
+        input_file
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        info = json.loads(result.stdout)
+        stream = info["streams"][0]
+        return {
+            "codec_name": stream.get("codec_name"),
+            "channels": int(stream.get("channels", 0)),
+            "sample_rate": int(stream.get("sample_rate", 0)),
+            "duration": float(info.get("format", {}).get("duration") or 0),
+        }
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError, KeyError, IndexError):
+        return None
+
+def needs_conversion(input_file, audio_format=AUDIO_FORMAT):
+    """
+    Return False when the input is already mono 16kHz in the codec of audio_format and can be
+    sent as-is. Uncompressed or lossless input (WAV, FLAC) is always re-encoded to cut its size.
+    """
+    info = probe_audio(input_file)
+    if info is None:
+        return True
+    return not (
+        info["codec_name"] == AUDIO_FORMATS[audio_format]["codec_name"]
+        and info["channels"] == AUDIO_CHANNELS
+        and info["sample_rate"] == AUDIO_SAMPLE_RATE
+    )
+
+def _ffmpeg_convert_command(input_file, output, audio_format):
+    """Build the ffmpeg command that downmixes/resamples input_file into audio_format."""
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported audio format: {audio_format}")
+    fmt = AUDIO_FORMATS[audio_format]
+    return [
+        'ffmpeg', '-y', '-nostdin',
+        '-i', input_file,
+        '-vn',                              # drop any video/cover art
+        '-ac', str(AUDIO_CHANNELS),         # mono
+        '-ar', str(AUDIO_SAMPLE_RATE),      # 16kHz
+        '-c:a', fmt["codec"],
+        '-b:a', fmt["bitrate"],
+        '-f', fmt["container"],
+        output
+    ]
+
+def convert_audio(input_file, audio_format=AUDIO_FORMAT):
+    """Convert input audio file to mono 16kHz audio_format in a temporary file using ffmpeg."""
     try:
-        temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
+        temp_output = tempfile.NamedTemporaryFile(delete=False, suffix=AUDIO_FORMATS[audio_format]["suffix"])
         output_path = temp_output.name
         temp_output.close()
 
-        command = [
-            'ffmpeg', '-y',
-            '-i', input_file,
-            '-ac', '1',            # mono
-            '-ar', '16000',        # 16kHz
-            '-b:a', '64k',         # 64 kbps
-            output_path
-        ]
+        command = _ffmpeg_convert_command(input_file, output_path, audio_format)
         subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         return output_path
     except subprocess.CalledProcessError as e:
+        clean_temp_files([output_path])
         raise RuntimeError(f"FFmpeg failed: {e}")
 
+def convert_to_mp3(input_file):
+    """Convert input audio file to MP3 using ffmpeg directly."""
+    return convert_audio(input_file, audio_format="mp3")
+
+@contextmanager
+def open_converted_audio(input_file, audio_format=AUDIO_FORMAT):
+    """
+    Yield a readable binary stream of input_file converted for transcription.
+
+    Conversion runs ffmpeg with its output on a stdout pipe, so the converted audio never
+    touches disk and can be uploaded while it is still being encoded. Input that is already
+    mono 16kHz in the target codec is passed through untouched. The input is read by path rather than over stdin
+    because containers such as MP4/M4A need a seekable input.
+    """
+    if not needs_conversion(input_file, audio_format):
+        with open(input_file, "rb") as f:
+            yield f
+        return
+
+    command = _ffmpeg_convert_command(input_file, "pipe:1", audio_format)
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Drain stderr in the background so a chatty ffmpeg can never block on a full pipe
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+    try:
+        yield process.stdout
+        # Make sure ffmpeg has written everything before checking its exit code
+        process.stdout.read()
+        process.wait()
+        stderr_reader.join()
+        if process.returncode != 0:
+            error_output = b"".join(stderr_chunks).decode(errors="replace").strip()
+            raise RuntimeError(f"FFmpeg failed with exit code {process.returncode}: {error_output[-500:]}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_SIZE while it is being streamed."""
+    pass
+
+class InvalidUploadError(Exception):
+    """Raised when an upload is not a complete multipart form with a file part."""
+    pass
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a summarization request cannot be brought under SUMMARY_TOKEN_BUDGET."""
+    pass
+
+async def stream_multipart_upload(body, content_type, file_field="file", max_size=MAX_UPLOAD_SIZE):
+    """
+    Parse a multipart/form-data body as it arrives. The file_field part is written straight
+    to a temporary file and aborts as soon as it exceeds max_size; other fields are kept in
+    memory. Returns (filename, file_path, size_in_bytes, sha256_hex, fields).
+    """
+    mimetype, params = parse_options_header(content_type or "")
+    boundary = params.get(b"boundary")
+    if mimetype != b"multipart/form-data" or not boundary:
+        raise InvalidUploadError("Expected a multipart/form-data body.")
+
+    sha256 = hashlib.sha256()
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "name": None, "is_file": False,
+             "value": bytearray(), "field_bytes": 0, "filename": None, "tmp_file": None, "size": 0, "ended": False}
+    fields = {}
+    pending = []  # file data parsed from the current network chunk, written outside the parser
+
+    def on_part_begin():
+        state.update(header_field=b"", header_value=b"", headers={}, value=bytearray())
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state.update(header_field=b"", header_value=b"")
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["name"] = options.get(b"name", b"").decode("utf-8", errors="replace")
+        state["is_file"] = state["name"] == file_field and b"filename" in options
+        if state["is_file"]:
+            if state["filename"] is not None:
+                raise InvalidUploadError("Only one file can be uploaded per request.")
+            state["filename"] = options[b"filename"].decode("utf-8", errors="replace")
+            state["tmp_file"] = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{state['filename']}")
+
+    def on_part_data(data, start, end):
+        if state["is_file"]:
+            state["size"] += end - start
+            if state["size"] > max_size:
+                raise UploadTooLargeError(f"File too large. Maximum size is {max_size // (1024 * 1024)}MB.")
+            pending.append(data[start:end])
+            return
+        state["field_bytes"] += end - start
+        if state["field_bytes"] > MAX_FORM_FIELDS_SIZE:
+            raise InvalidUploadError("Form fields are too large.")
+        state["value"] += data[start:end]
+
+    def on_part_end():
+        if not state["is_file"]:
+            fields[state["name"]] = state["value"].decode("utf-8", errors="replace")
+
+    def on_end():
+        state["ended"] = True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin, "on_part_data": on_part_data, "on_part_end": on_part_end,
+        "on_header_field": on_header_field, "on_header_value": on_header_value,
+        "on_header_end": on_header_end, "on_headers_finished": on_headers_finished, "on_end": on_end,
+    })
+    try:
+        with stage_timer("upload_read"):
+            async for chunk in body:
+                parser.write(chunk)
+                if pending:
+                    data = b"".join(pending)
+                    pending.clear()
+                    sha256.update(data)
+                    # Disk writes run in a thread so a slow disk never stalls the event loop
+                    await asyncio.to_thread(state["tmp_file"].write, data)
+            parser.finalize()
+            if not state["ended"]:
+                raise InvalidUploadError("Upload ended before the multipart body was complete.")
+            if state["filename"] is None:
+                raise InvalidUploadError(f"No '{file_field}' file in the upload.")
+            await asyncio.to_thread(state["tmp_file"].close)
+    except BaseException:
+        if state["tmp_file"] is not None:
+            state["tmp_file"].close()
+            clean_temp_files([state["tmp_file"].name])
+        raise
+    BYTES_PROCESSED.inc(state["size"], kind="upload")
+    return state["filename"], state["tmp_file"].name, state["size"], sha256.hexdigest(), fields
+
 def clean_temp_files(file_list):
     """Clean up temporary files."""
     for file_path in file_list:
@@ -167,22 +355,62 @@ def clean_temp_files(file_list):
             print(f"Warning: Could not delete temp file {file_path}: {e}")
             pass
 
-def transcribe_audio(audio_file, word_boost="", language="auto"):
+def build_transcript_result(utterances, fallback_text=None):
+    """
+    Build the {"text", "speakers", "utterances"} result from a list of utterance dicts.
+    Without utterances, fallback_text becomes the transcript of a single "Unknown" speaker.
+    """
+    transcript_text = ""
+    speaker_set = set()
+
+    if utterances:
+        transcript_text = "".join(f"Speaker {u['speaker']}: {u['text']}\n" for u in utterances)
+        speaker_set.update(u["speaker"] for u in utterances)
+    else:
+        transcript_text = fallback_text if fallback_text else "(No speech detected or transcription empty)"
+        speaker_set.add("Unknown")
+
+    # Sort speakers
+    try:
+        sorted_speakers = sorted(list(speaker_set), key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
+    except:
+        sorted_speakers = sorted(list(speaker_set))
+
+    # Create speakers JSON string for database storage
+    speakers_data = [{"speaker": speaker, "description": ""} for speaker in sorted_speakers]
+
+    return {
+        "text": transcript_text,
+        "speakers": json.dumps(speakers_data),
+        "utterances": utterances
+    }
+
+def upload_audio(audio_stream):
+    """
+    Upload a binary audio stream to AssemblyAI and return its private URL.
+    The stream is sent as a chunk iterator so httpx uses chunked transfer encoding: given
+    a file object it would take the Content-Length from fstat, which is 0 for a pipe.
+    """
+    configure_assemblyai()
+    http_client = aai.Client.get_default().http_client
+    chunks = iter(lambda: audio_stream.read(UPLOAD_CHUNK_SIZE), b"")
+    return aai.api.upload_file(client=http_client, audio_file=chunks)
+
+def transcribe_audio(audio_file, word_boost="", language="auto", speaker_labels=True, word_timestamps=False):
     """
-    Transcribe the audio file using AssemblyAI, waiting for completion.
-    Returns dict with transcript text and speakers info.
+    Transcribe already-converted audio using AssemblyAI, waiting for completion.
+    audio_file may be a local path or a URL returned by upload_audio.
+    Returns dict with transcript text, speakers info and timestamped utterances.
+    With word_timestamps, each utterance also gets its "words" with their own times.
     """
     if not audio_file:
         raise ValueError("No audio file provided")
 
-    temp_files = []
-    mp3_file = None
-    try:
-        mp3_file = convert_to_mp3(audio_file)
-        temp_files.append(mp3_file)
+    configure_assemblyai()
 
+    try:
         config_kwargs = {
-            "speaker_labels": True,
+            "speaker_labels": speaker_labels,
             "language_detection": True if language == "auto" else False,
             "language_code": None if language == "auto" else language,
             "word_boost": [word.strip() for word in word_boost.split(",")] if word_boost else None,
@@ -193,40 +421,28 @@ def transcribe_audio(audio_file, word_boost="", language="auto"):
         transcriber = aai.Transcriber()
 
         # Use transcribe() which waits for the result
-        transcript = transcriber.transcribe(mp3_file, config=config)
+        transcript = transcriber.transcribe(audio_file, config=config)
         print(f"Transcription id: {transcript.id}")
 
         # Process the result
         if transcript.status == aai.TranscriptStatus.completed:
-            transcript_text = ""
-            speaker_set = set()
-
-            if transcript.utterances:
-                for utterance in transcript.utterances:
-                    speaker = utterance.speaker if utterance.speaker else "Unknown"
-                    transcript_text += f"Speaker {speaker}: {utterance.text}\n"
-                    speaker_set.add(speaker)
-            else:
-                transcript_text = transcript.text if transcript.text else "(No speech detected or transcription empty)"
-                speaker_set.add("Unknown")
-
-            # Ensure speaker_set has at least one entry if transcript_text exists
-            if not speaker_set and transcript_text and transcript_text != "(No speech detected or transcription empty)":
-                speaker_set.add("Unknown")
-
-            # Sort speakers
-            try:
-                sorted_speakers = sorted(list(speaker_set), key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
-            except:
-                sorted_speakers = sorted(list(speaker_set))
-
-            # Create speakers JSON string for database storage
-            speakers_data = [{"speaker": speaker, "description": ""} for speaker in sorted_speakers]
-            
-            return {
-                "text": transcript_text,
-                "speakers": json.dumps(speakers_data)
-            }
+            utterances = [
+                {
+                    "speaker": utterance.speaker if utterance.speaker else "Unknown",
+                    "start_ms": utterance.start,
+                    "end_ms": utterance.end,
+                    "text": utterance.text,
+                    "confidence": utterance.confidence,
+                }
+                for utterance in (transcript.utterances or [])
+            ]
+            if word_timestamps:
+                for u, utterance in zip(utterances, transcript.utterances or []):
+                    u["words"] = [
+                        {"text": word.text, "start_ms": word.start, "end_ms": word.end}
+                        for word in (utterance.words or [])
+                    ]
+            return build_transcript_result(utterances, fallback_text=transcript.text)
 
         elif transcript.status == aai.TranscriptStatus.error:
             raise RuntimeError(f"Transcription Error: {transcript.error}")
@@ -235,80 +451,355 @@ def transcribe_audio(audio_file, word_boost="", language="auto"):
 
     except Exception as e:
         raise RuntimeError(f"Error during transcription process: {str(e)}")
-    finally:
-        clean_temp_files(temp_files)
 
-def summarize_meeting(transcript, speaker_table=None, system_prompt_language="en", temperature=0.8):
-    """Summarize meeting transcript with optional speaker information."""
-    if not transcript or transcript.strip() == "" or transcript.strip() == "(No speech detected or transcription empty)":
-        return "No transcript available to summarize."
+# Prompts for summarizing one part of a long meeting (map step of map-reduce)
+CHUNK_PROMPTS = {
+    "en": '''You will receive one consecutive part of a longer meeting transcript. Write compact notes for this part only:
+- Topics discussed, with specific arguments, figures and time points
+- Decisions or consensus reached
+- Action items with responsible parties and deadlines
+Keep speaker names and proper nouns as they appear, correct obvious speech-to-text errors, and omit small talk. Return only the notes as a bullet list.
+''',
 
-    if client is None:
-        print("⚠️ OpenAI client is None, attempting to reinitialize...")
-        if not initialize_openai_client():
-            raise RuntimeError(
-                f"OpenAI client is not initialized. Please check your configuration:\n"
-                f"- OPENAI_API_KEY: {'Set' if OPENAI_API_KEY and OPENAI_API_KEY != 'openai_api_key' else 'NOT SET'}\n"
-                f"- OPENAI_BASE_URL: {OPENAI_BASE_URL}\n"
-                f"- TEXT_MODEL_NAME: {TEXT_MODEL_NAME}"
-            )
+    "cn": '''你将收到一段较长会议转录中连续的一部分。请仅针对这一部分撰写精炼的笔记：
+- 讨论的议题，包括具体论点、数据和时间点
+- 达成的决定或共识
+- 行动项，包括负责人和时间节点
+保留原有的演讲者姓名和专有名词，修正明显的语音转写错误，省略闲聊。仅以列表形式返回笔记。
+'''
+}
+
+# Long-transcript (map-reduce) summarization settings
+SUMMARY_CHUNK_THRESHOLD_TOKENS = int(os.getenv("SUMMARY_CHUNK_THRESHOLD_TOKENS", "24000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "8000"))
+SUMMARY_MAX_PARALLEL = int(os.getenv("SUMMARY_MAX_PARALLEL", "4"))
+
+# Largest prompt (estimated tokens) sent in one LLM request, and what to do when a request
+# would exceed it: "downgrade" (compact with every rule, then fall back to map-reduce) or "refuse"
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "100000"))
+SUMMARY_OVER_BUDGET = os.getenv("SUMMARY_OVER_BUDGET", "downgrade")
+
+_UTTERANCE_START = re.compile(r"^Speaker [^:\n]+:", re.MULTILINE)
+def _transcript_pieces(transcript, max_tokens):
+    """
+    Cut a transcript at "Speaker X:" utterance boundaries. An utterance longer than
+    max_tokens on its own is cut at line breaks, then at a hard character limit.
+    """
+    starts = [m.start() for m in _UTTERANCE_START.finditer(transcript)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    utterances = [transcript[a:b] for a, b in zip(starts, starts[1:] + [len(transcript)])]
+
+    pieces = []
+    for utterance in utterances:
+        if estimate_tokens(utterance) <= max_tokens:
+            pieces.append(utterance)
+            continue
+        # Oversized utterance: fall back to smaller units
+        for line in utterance.splitlines(keepends=True):
+            while estimate_tokens(line) > max_tokens:
+                cut = max(1, len(line) * max_tokens // estimate_tokens(line))
+                pieces.append(line[:cut])
+                line = line[cut:]
+            pieces.append(line)
+    return pieces
+
+def split_transcript(transcript, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """
+    Split a transcript into chunks of at most max_tokens, cutting only at
+    "Speaker X:" utterance boundaries (see _transcript_pieces for oversized utterances).
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in _transcript_pieces(transcript, max_tokens):
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("".join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+def split_sections(transcript, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """
+    Split a transcript into sections of at most max_tokens whose boundaries depend on content.
+
+    Once a section holds half of max_tokens, it ends after an utterance whose hash falls
+    below a threshold proportional to the utterance's size, so sections average about
+    three quarters of max_tokens. Because a boundary only depends on the utterances since
+    the previous one, editing a few lines changes the sections around the edit and
+    leaves the rest (and their fingerprints) as they were.
+    """
+    min_tokens = max_tokens // 2
+    sections = []
+    current = []
+    current_tokens = 0
+    for piece in _transcript_pieces(transcript, max_tokens):
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            sections.append("".join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+
+        if current_tokens >= min_tokens:
+            digest = int.from_bytes(hashlib.sha256(piece.encode("utf-8")).digest()[:4], "big")
+            if digest < (2 ** 32) * min(1.0, piece_tokens * 2 / max_tokens):
+                sections.append("".join(current))
+                current = []
+                current_tokens = 0
+    if current:
+        sections.append("".join(current))
+    return [section for section in sections if section.strip()]
+
+def section_fingerprint(section, system_prompt_language, speaker_info_str, temperature, model=TEXT_MODEL_NAME):
+    """Fingerprint of everything that changes the intermediate summary of one section."""
+    return hashlib.sha256(
+        json.dumps([section, system_prompt_language, speaker_info_str, float(temperature), model]).encode("utf-8")
+    ).hexdigest()
+
+def _speaker_info(speaker_table):
+    """Format the speaker table as a block appended to the user message."""
+    if not speaker_table:
+        return ""
+    # speaker_table is expected to be a list of [speaker_name, description] pairs
+    return "\n\nSpeaker Information:\n" + "\n".join(
+        [f"Speaker {row[0]}: {row[1]}" for row in speaker_table if len(row) > 1 and row[1].strip()]
+    )
+
+def _messages(system_prompt, content, temperature):
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content}
+    ]
+    print(f"Making OpenAI request with model: {TEXT_MODEL_NAME}")
+    print(f"Messages: {len(messages)} messages")
+    print(f"Temperature: {temperature}")
+    return messages
+
+async def _complete(system_prompt, content, temperature):
+    """Run one chat completion and return the stripped response text."""
+    response = await chat_completion(_messages(system_prompt, content, temperature), temperature=temperature)
+    print(f"OpenAI response received successfully")
+    return (response.choices[0].message.content or "").strip()
+
+def _prepare_transcript(transcript, system_prompt, speaker_info_str, report):
+    """
+    Compact the transcript and decide between one request and map-reduce, within SUMMARY_TOKEN_BUDGET.
+    Returns (transcript, use_map_reduce) and fills report with the token counts.
+    """
+    with stage_timer("compact"):
+        compacted, compaction = compact_transcript(transcript)
+    report.update(compaction)
+
+    def request_tokens(text):
+        return estimate_tokens(system_prompt) + estimate_tokens(text) + estimate_tokens(speaker_info_str)
+
+    over_budget = request_tokens(compacted) > SUMMARY_TOKEN_BUDGET
+    if over_budget and SUMMARY_OVER_BUDGET == "downgrade" and set(report["rules"]) != set(COMPACTION_RULES):
+        # First downgrade step: compact with every rule, whatever TRANSCRIPT_COMPACTION says
+        compacted, compaction = compact_transcript(transcript, rules=COMPACTION_RULES)
+        report.update(compaction)
+        over_budget = request_tokens(compacted) > SUMMARY_TOKEN_BUDGET
+
+    COMPACTION_TOKENS.inc(report["tokens_before"], phase="before")
+    COMPACTION_TOKENS.inc(report["tokens_after"], phase="after")
+    print(
+        f"Transcript compaction ({', '.join(report['rules']) or 'off'}): "
+        f"{report['tokens_before']} -> {report['tokens_after']} estimated tokens ({report['saved_ratio']:.0%} saved)"
+    )
+
+    if over_budget and SUMMARY_OVER_BUDGET != "downgrade":
+        raise TokenBudgetExceeded(
+            f"Transcript needs about {request_tokens(compacted)} tokens, over the budget of {SUMMARY_TOKEN_BUDGET}"
+        )
+    report["downgraded"] = over_budget
+    use_map_reduce = over_budget or report["tokens_after"] > SUMMARY_CHUNK_THRESHOLD_TOKENS
+    return compacted, use_map_reduce
 
+async def _reduce_request(transcript, speaker_info_str, system_prompt_language, temperature, section_notes=None,
+                          report=None):
+    """
+    Build the (system_prompt, content) of the final summarization request.
+    The transcript is compacted first. Long transcripts, and ones over SUMMARY_TOKEN_BUDGET, are first
+    mapped to section notes concurrently, and the notes become the content.
+
+    section_notes, if given, maps section fingerprints to notes from earlier runs. Only sections
+    missing from it are sent to the model; on return it holds exactly the current sections' notes.
+    report, if given, receives the compaction token counts, the strategy and the final prompt size.
+    """
+    report = report if report is not None else {}
     system_prompt = SYSTEM_PROMPTS.get(system_prompt_language, SYSTEM_PROMPTS["en"])
+    transcript, use_map_reduce = _prepare_transcript(transcript, system_prompt, speaker_info_str, report)
 
-    try:
-        speaker_info_str = ""
-        if speaker_table:
-            # speaker_table is expected to be a list of [speaker_name, description] pairs
-            speaker_info_str = "\n\nSpeaker Information:\n" + "\n".join(
-                [f"Speaker {row[0]}: {row[1]}" for row in speaker_table if len(row) > 1 and row[1].strip()]
-            )
-            
+    if not use_map_reduce:
+        if section_notes is not None:
+            section_notes.clear()
         content = f"Transcription:\n{transcript}\n----{speaker_info_str}"
+        report.update(strategy="single", prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(content))
+        return system_prompt, content
+
+    chunks = split_sections(transcript, min(SUMMARY_CHUNK_TOKENS, SUMMARY_TOKEN_BUDGET))
+    chunk_prompt = CHUNK_PROMPTS.get(system_prompt_language, CHUNK_PROMPTS["en"])
+    known = section_notes if section_notes is not None else {}
+    fingerprints = [
+        section_fingerprint(chunk, system_prompt_language, speaker_info_str, temperature) for chunk in chunks
+    ]
+    stale = sum(1 for fingerprint in fingerprints if fingerprint not in known)
+    print(f"Long transcript: {len(chunks)} sections, summarizing {stale} with up to {SUMMARY_MAX_PARALLEL} in parallel")
+
+    parallel = asyncio.Semaphore(max(1, SUMMARY_MAX_PARALLEL))
+
+    async def summarize_chunk(chunk, fingerprint):
+        # The part number is left out of the prompt so notes stay valid when sections shift
+        if fingerprint in known:
+            return known[fingerprint]
+        content = f"Transcription (one part of a longer meeting):\n{chunk}\n----{speaker_info_str}"
+        async with parallel:
+            return await _complete(chunk_prompt, content, temperature)
+
+    partial_summaries = await asyncio.gather(*(
+        summarize_chunk(chunk, fingerprint) for chunk, fingerprint in zip(chunks, fingerprints)
+    ))
+    if section_notes is not None:
+        section_notes.clear()
+        section_notes.update(zip(fingerprints, partial_summaries))
+
+    notes = "\n\n".join(
+        f"Part {index + 1}:\n{partial}" for index, partial in enumerate(partial_summaries) if partial
+    )
+    content = (
+        f"The meeting was too long to send at once. These are notes on its consecutive parts, in order; "
+        f"treat them as the transcription.\n\nTranscription:\n{notes}\n----{speaker_info_str}"
+    )
+    prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(content)
+    report.update(strategy="map_reduce", sections=len(chunks), prompt_tokens=prompt_tokens)
+    if prompt_tokens > SUMMARY_TOKEN_BUDGET:
+        raise TokenBudgetExceeded(
+            f"Section notes need about {prompt_tokens} tokens, over the budget of {SUMMARY_TOKEN_BUDGET}"
+        )
+    return system_prompt, content
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": content}
-        ]
+async def summarize_meeting(transcript, speaker_table=None, system_prompt_language="en", temperature=0.8,
+                            section_notes=None, report=None):
+    """
+    Summarize meeting transcript with optional speaker information.
+    Transcripts above SUMMARY_CHUNK_THRESHOLD_TOKENS are summarized with map-reduce; pass
+    section_notes (see _reduce_request) to reuse the notes of unchanged sections, and report
+    to receive token counts before and after compaction.
+    """
+    if not transcript or transcript.strip() == "" or transcript.strip() == "(No speech detected or transcription empty)":
+        return "No transcript available to summarize."
 
-        print(f"Making OpenAI request with model: {TEXT_MODEL_NAME}")
-        print(f"Messages: {len(messages)} messages")
-        print(f"Temperature: {temperature}")
-        
-        response = client.chat.completions.create(
-            model=TEXT_MODEL_NAME,
-            messages=messages,
-            temperature=temperature
-        )
-        
-        print(f"OpenAI response received successfully")
-        summary = response.choices[0].message.content.strip()
+    ensure_configured()
+
+    try:
+        with stage_timer("summarize"):
+            speaker_info_str = _speaker_info(speaker_table)
+            system_prompt, content = await _reduce_request(
+                transcript, speaker_info_str, system_prompt_language, temperature, section_notes, report
+            )
+            summary = await _complete(system_prompt, content, temperature)
         
         if not summary:
             return "(Summary generation failed or produced empty result)"
         return summary
 
+    except TokenBudgetExceeded:
+        raise
     except Exception as e:
         raise RuntimeError(f"Summarization error: {str(e)}")
 
-def save_summary_as_markdown(transcript, summary, filename_base=None):
-    """Save summary and transcript as markdown file."""
+async def stream_summarize_meeting(transcript, speaker_table=None, system_prompt_language="en", temperature=0.8,
+                                   section_notes=None, report=None):
+    """
+    Like summarize_meeting, but yield the summary as text deltas while the model generates it.
+    For long transcripts the chunk summaries are computed first and only the final reduce step streams.
+    """
+    if not transcript or transcript.strip() == "" or transcript.strip() == "(No speech detected or transcription empty)":
+        yield "No transcript available to summarize."
+        return
+
+    ensure_configured()
+
+    try:
+        with stage_timer("summarize"):
+            speaker_info_str = _speaker_info(speaker_table)
+            system_prompt, content = await _reduce_request(
+                transcript, speaker_info_str, system_prompt_language, temperature, section_notes, report
+            )
+            async for delta in stream_chat_completion(_messages(system_prompt, content, temperature), temperature=temperature):
+                yield delta
+
+    except TokenBudgetExceeded:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Summarization error: {str(e)}")
+
+def iter_summary_markdown(transcript, summary, filename_base=None):
+    """
+    Yield the Markdown export of a meeting (summary, then full transcript) as UTF-8 chunks,
+    so it can be streamed without building the whole document or writing it to disk.
+    """
     now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"meeting_{now_str}.md"
 
-    save_dir = os.path.join(tempfile.gettempdir(), "meeting_summaries")
-    os.makedirs(save_dir, exist_ok=True)
-    file_path = os.path.join(save_dir, filename)
+    def pieces():
+        yield f"## {filename_base or 'Meeting'} - {now_str}\n\n***\n\n### Summary\n\n"
+        yield from _slices(summary or "")
+        yield "\n\n"
+        if transcript:
+            yield "\n\n***\n\n### Full Transcript\n\n"
+            yield from _slices(transcript)
+            yield "\n\n"
 
-    content = f"## {filename_base or 'Meeting'} - {now_str}\n\n***\n\n### Summary\n\n{summary}\n\n"
+    with stage_timer("export"):
+        for piece in pieces():
+            data = piece.encode("utf-8")
+            BYTES_PROCESSED.inc(len(data), kind="export")
+            yield data
 
-    if transcript:
-        content += f"\n\n***\n\n### Full Transcript\n\n{transcript}\n\n"
+def _slices(text, size=EXPORT_CHUNK_CHARS):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
 
-    try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        print(f"Summary saved to: {file_path}")
-        return file_path
-    except Exception as e:
-        print(f"Error saving markdown file: {e}")
-        raise RuntimeError(f"Error saving markdown file: {e}")
\ No newline at end of file
+class _ZipStream:
+    """Write-only file object that hands over what zipfile has written so far."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+def iter_markdown_zip(meetings):
+    """
+    Stream a ZIP archive with one Markdown export per meeting. `meetings` yields
+    (archive_name, transcript, summary, filename_base) and is consumed lazily, so memory
+    use stays flat however many meetings go into the archive.
+    """
+    output = _ZipStream()
+    # zipfile writes data descriptors instead of seeking back when the output is not seekable
+    with zipfile.ZipFile(output, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for archive_name, transcript, summary, filename_base in meetings:
+            with archive.open(archive_name, mode="w") as entry:
+                for data in iter_summary_markdown(transcript, summary, filename_base):
+                    entry.write(data)
+                    chunk = output.drain()
+                    if chunk:
+                        yield chunk
+    # Whatever is left of the last entry, then the central directory
+    yield output.drain()
\ No newline at end of file
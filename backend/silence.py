@@ -0,0 +1,158 @@
+import bisect
+import os
+import re
+import subprocess
+import tempfile
+
+from services import AUDIO_FORMAT, AUDIO_FORMATS, AUDIO_CHANNELS, AUDIO_SAMPLE_RATE, clean_temp_files
+
+# Optional preprocessing: shorten long silences (dead air, waiting for people to join)
+# before the audio is sent for transcription. Off by default.
+SILENCE_TRIMMING = os.getenv("SILENCE_TRIMMING", "false").lower() == "true"
+SILENCE_THRESHOLD_DB = float(os.getenv("SILENCE_THRESHOLD_DB", "-35"))  # quieter than this counts as silence
+SILENCE_MIN_SECONDS = float(os.getenv("SILENCE_MIN_SECONDS", "2.0"))  # shorter pauses are left alone
+SILENCE_KEEP_SECONDS = float(os.getenv("SILENCE_KEEP_SECONDS", "0.5"))  # kept on each side of speech
+
+# Not worth a second encoding pass when trimming would save less than this
+SILENCE_MIN_REMOVED_SECONDS = 5.0
+
+# 10ms audio frames at 16kHz, so cuts land within 10ms of the planned position
+_FRAME_SAMPLES = AUDIO_SAMPLE_RATE // 100
+
+_SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+_DURATION = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+
+class TimeMap:
+    """
+    Maps times in trimmed audio back to the original recording. Holds the kept regions as
+    (trimmed_start_ms, original_start_ms, length_ms), in order.
+    """
+
+    def __init__(self, regions):
+        self.regions = []
+        trimmed_ms = 0
+        for start, end in regions:
+            length_ms = int(round((end - start) * 1000))
+            self.regions.append((trimmed_ms, int(round(start * 1000)), length_ms))
+            trimmed_ms += length_ms
+        self._starts = [region[0] for region in self.regions]
+
+    def to_original(self, trimmed_ms):
+        if trimmed_ms is None or not self.regions:
+            return trimmed_ms
+        index = max(0, bisect.bisect_right(self._starts, trimmed_ms) - 1)
+        trimmed_start, original_start, length_ms = self.regions[index]
+        # Past the end of the last region (encoder padding) stays at the end of it
+        return original_start + min(trimmed_ms - trimmed_start, length_ms)
+
+    def map_utterances(self, utterances):
+        """Return utterances with start_ms/end_ms moved from trimmed to original time."""
+        return [
+            dict(u, start_ms=self.to_original(u.get("start_ms")), end_ms=self.to_original(u.get("end_ms")))
+            for u in utterances or []
+        ]
+
+def detect_silences(input_file, threshold_db=SILENCE_THRESHOLD_DB, min_seconds=SILENCE_MIN_SECONDS):
+    """
+    Run ffmpeg's silencedetect over input_file. Returns (silences, duration_seconds), with
+    silences as (start, end) pairs in seconds; trailing silence ends at the duration.
+    """
+    command = [
+        'ffmpeg', '-nostdin', '-hide_banner',
+        '-i', input_file,
+        '-vn',
+        '-af', f"silencedetect=noise={threshold_db}dB:d={min_seconds}",
+        '-f', 'null', '-'
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True, errors="replace")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg silence detection failed: {e.stderr[-500:]}")
+
+    duration = 0.0
+    match = _DURATION.search(result.stderr)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = _SILENCE_START.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    if start is not None and duration > start:
+        silences.append((start, duration))
+    return silences, duration
+
+def plan_kept_regions(silences, duration, keep_seconds=SILENCE_KEEP_SECONDS):
+    """
+    Turn detected silences into the (start, end) regions of audio to keep. Every silence
+    shrinks to keep_seconds on each side, so words at its edges are not clipped.
+    """
+    kept = []
+    position = 0.0
+    for start, end in silences:
+        cut_start = 0.0 if start <= 0 else start + keep_seconds
+        cut_end = duration if end >= duration else end - keep_seconds
+        if cut_end - cut_start <= 0:
+            continue
+        if cut_start > position:
+            kept.append((position, cut_start))
+        position = max(position, cut_end)
+    if position < duration:
+        kept.append((position, duration))
+    return kept
+
+def _select_expression(regions):
+    return "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in regions)
+
+def trim_silence(input_file, audio_format=AUDIO_FORMAT):
+    """
+    Write a copy of input_file with long silences shortened, converted for transcription.
+    Returns (output_path, time_map, report), or None when there is too little silence to
+    bother. The report holds the original, trimmed and removed seconds.
+    """
+    silences, duration = detect_silences(input_file)
+    regions = plan_kept_regions(silences, duration)
+    kept_seconds = sum(end - start for start, end in regions)
+    removed_seconds = duration - kept_seconds
+    if not regions or removed_seconds < SILENCE_MIN_REMOVED_SECONDS:
+        return None
+
+    fmt = AUDIO_FORMATS[audio_format]
+    output_path = tempfile.NamedTemporaryFile(delete=False, suffix=fmt["suffix"]).name
+    audio_filter = (
+        f"aresample={AUDIO_SAMPLE_RATE},asetnsamples=n={_FRAME_SAMPLES}:p=0,"
+        f"aselect='{_select_expression(regions)}',asetpts=N/SR/TB"
+    )
+    command = [
+        'ffmpeg', '-y', '-nostdin',
+        '-i', input_file,
+        '-vn',
+        '-af', audio_filter,
+        '-ac', str(AUDIO_CHANNELS),
+        '-ar', str(AUDIO_SAMPLE_RATE),
+        '-c:a', fmt["codec"],
+        '-b:a', fmt["bitrate"],
+        '-f', fmt["container"],
+        output_path
+    ]
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        clean_temp_files([output_path])
+        raise RuntimeError(f"FFmpeg failed to trim silence: {e.stderr.decode(errors='replace')[-500:]}")
+
+    report = {
+        "original_seconds": round(duration, 3),
+        "trimmed_seconds": round(kept_seconds, 3),
+        "removed_seconds": round(removed_seconds, 3),
+    }
+    return output_path, TimeMap(regions), report
@@ -0,0 +1,431 @@
+import os
+import string
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import AUDIO_SECONDS, SILENCE_REMOVED_SECONDS, stage_timer
+from silence import SILENCE_TRIMMING, trim_silence
+
+from services import (
+    AUDIO_FORMAT, AUDIO_FORMATS, AUDIO_CHANNELS, AUDIO_SAMPLE_RATE,
+    open_converted_audio, upload_audio, transcribe_audio, probe_audio,
+    build_transcript_result, clean_temp_files, check_assemblyai, UPLOAD_CHUNK_SIZE
+)
+
+# Which transcription backend to use: "assemblyai" or "fake" (local, no network)
+TRANSCRIPTION_PROVIDER = os.getenv("TRANSCRIPTION_PROVIDER", "assemblyai")
+
+# Parallel chunked transcription of long recordings
+CHUNKED_TRANSCRIPTION = os.getenv("CHUNKED_TRANSCRIPTION", "false").lower() == "true"
+CHUNK_THRESHOLD_SECONDS = float(os.getenv("CHUNK_THRESHOLD_SECONDS", "2700"))  # 45 minutes
+SEGMENT_SECONDS = float(os.getenv("SEGMENT_SECONDS", "900"))  # 15 minutes
+SEGMENT_OVERLAP_SECONDS = float(os.getenv("SEGMENT_OVERLAP_SECONDS", "20"))
+TRANSCRIPTION_MAX_PARALLEL = int(os.getenv("TRANSCRIPTION_MAX_PARALLEL", "4"))
+
+# Fake backend: processing delay per file and shape of the generated transcript
+FAKE_TRANSCRIPTION_LATENCY_SECONDS = float(os.getenv("FAKE_TRANSCRIPTION_LATENCY_SECONDS", "1.0"))
+FAKE_TRANSCRIPTION_UTTERANCE_SECONDS = float(os.getenv("FAKE_TRANSCRIPTION_UTTERANCE_SECONDS", "10"))
+FAKE_TRANSCRIPTION_WORDS_PER_UTTERANCE = int(os.getenv("FAKE_TRANSCRIPTION_WORDS_PER_UTTERANCE", "25"))
+FAKE_TRANSCRIPTION_SPEAKERS = int(os.getenv("FAKE_TRANSCRIPTION_SPEAKERS", "2"))
+
+class Transcriber:
+    """
+    Interface for transcription backends.
+
+    transcribe() takes a path to an audio file and returns the
+    {"text", "speakers", "utterances"} dict built by build_transcript_result,
+    with utterance timestamps in milliseconds from the start of that file.
+    on_stage, if given, is called with "converting" / "transcribing" as work progresses.
+    With word_timestamps, utterances also carry "words": [{"text", "start_ms", "end_ms"}].
+    """
+
+    def transcribe(self, audio_path, word_boost="", language="auto", speaker_labels=True, on_stage=None,
+                   word_timestamps=False):
+        raise NotImplementedError
+
+    def check(self):
+        """Connectivity check for the readiness probe; raises if the backend is unreachable."""
+
+class AssemblyAITranscriber(Transcriber):
+    """Converts through an ffmpeg pipe, uploads to AssemblyAI and waits for the transcript."""
+
+    def transcribe(self, audio_path, word_boost="", language="auto", speaker_labels=True, on_stage=None,
+                   word_timestamps=False):
+        if on_stage:
+            on_stage("converting")
+        # ffmpeg output is streamed straight into the provider upload, so this stage covers both
+        with stage_timer("convert"), open_converted_audio(audio_path) as audio_stream:
+            audio_url = upload_audio(audio_stream)
+
+        if on_stage:
+            on_stage("transcribing")
+        with stage_timer("transcribe"):
+            return transcribe_audio(
+                audio_url, word_boost=word_boost, language=language, speaker_labels=speaker_labels,
+                word_timestamps=word_timestamps
+            )
+
+    def check(self):
+        check_assemblyai()
+
+class FakeTranscriber(Transcriber):
+    """
+    Local stand-in that returns synthetic utterances without any network calls.
+    The audio still goes through the real ffmpeg conversion, read to the end in place of
+    the provider upload, so benchmarks measure the convert stage too.
+    The audio duration comes from ffprobe, or duration_seconds when probing is not possible.
+    """
+
+    def __init__(self, latency_seconds=FAKE_TRANSCRIPTION_LATENCY_SECONDS,
+                 utterance_seconds=FAKE_TRANSCRIPTION_UTTERANCE_SECONDS,
+                 words_per_utterance=FAKE_TRANSCRIPTION_WORDS_PER_UTTERANCE,
+                 speakers=FAKE_TRANSCRIPTION_SPEAKERS, duration_seconds=60.0):
+        self.latency_seconds = latency_seconds
+        self.utterance_seconds = utterance_seconds
+        self.words_per_utterance = words_per_utterance
+        self.speakers = speakers
+        self.duration_seconds = duration_seconds
+
+    def transcribe(self, audio_path, word_boost="", language="auto", speaker_labels=True, on_stage=None,
+                   word_timestamps=False):
+        if on_stage:
+            on_stage("converting")
+        with stage_timer("convert"), open_converted_audio(audio_path) as audio_stream:
+            for _ in iter(lambda: audio_stream.read(UPLOAD_CHUNK_SIZE), b""):
+                pass
+
+        if on_stage:
+            on_stage("transcribing")
+        with stage_timer("transcribe"):
+            if self.latency_seconds:
+                time.sleep(self.latency_seconds)
+            info = probe_audio(audio_path)
+        duration_ms = int((info["duration"] if info and info["duration"] else self.duration_seconds) * 1000)
+        step_ms = int(self.utterance_seconds * 1000)
+
+        utterances = []
+        for index, start_ms in enumerate(range(0, duration_ms, step_ms)):
+            end_ms = min(start_ms + step_ms, duration_ms)
+            words = [f"word{start_ms // 1000 + n}" for n in range(self.words_per_utterance)]
+            utterance = {
+                "speaker": speaker_label(index % self.speakers if speaker_labels else 0),
+                "start_ms": start_ms,
+                "end_ms": end_ms,
+                "text": " ".join(words),
+                "confidence": 1.0,
+            }
+            if word_timestamps:
+                # Words spread evenly over the utterance
+                word_ms = (end_ms - start_ms) / max(1, len(words))
+                utterance["words"] = [
+                    {"text": word, "start_ms": int(start_ms + n * word_ms), "end_ms": int(start_ms + (n + 1) * word_ms)}
+                    for n, word in enumerate(words)
+                ]
+            utterances.append(utterance)
+        return build_transcript_result(utterances)
+
+def get_transcriber(provider=None):
+    """Return the transcriber for provider (default: TRANSCRIPTION_PROVIDER)."""
+    provider = provider or TRANSCRIPTION_PROVIDER
+    if provider == "assemblyai":
+        return AssemblyAITranscriber()
+    if provider == "fake":
+        return FakeTranscriber()
+    raise ValueError(f"Unknown transcription provider: {provider}")
+
+def speaker_label(n):
+    """0 -> "A", 25 -> "Z", 26 -> "AA", ..."""
+    label = ""
+    n += 1
+    while n:
+        n, remainder = divmod(n - 1, 26)
+        label = string.ascii_uppercase[remainder] + label
+    return label
+
+def plan_segments(duration_seconds, segment_seconds=SEGMENT_SECONDS, overlap_seconds=SEGMENT_OVERLAP_SECONDS):
+    """Return (start, length) pairs in seconds covering the recording with overlapping segments."""
+    step = segment_seconds - overlap_seconds
+    if step <= 0:
+        raise ValueError("SEGMENT_SECONDS must be larger than SEGMENT_OVERLAP_SECONDS")
+    segments = []
+    start = 0.0
+    while True:
+        length = min(segment_seconds, duration_seconds - start)
+        segments.append((start, length))
+        if start + length >= duration_seconds:
+            return segments
+        start += step
+
+def extract_segment(input_file, start_seconds, length_seconds):
+    """Cut one segment out of input_file with ffmpeg, already converted for transcription."""
+    fmt = AUDIO_FORMATS[AUDIO_FORMAT]
+    output_path = tempfile.NamedTemporaryFile(delete=False, suffix=fmt["suffix"]).name
+    command = [
+        'ffmpeg', '-y', '-nostdin',
+        '-ss', f"{start_seconds:.3f}",
+        '-t', f"{length_seconds:.3f}",
+        '-i', input_file,
+        '-vn',
+        '-ac', str(AUDIO_CHANNELS),
+        '-ar', str(AUDIO_SAMPLE_RATE),
+        '-c:a', fmt["codec"],
+        '-b:a', fmt["bitrate"],
+        '-f', fmt["container"],
+        output_path
+    ]
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError as e:
+        clean_temp_files([output_path])
+        raise RuntimeError(f"FFmpeg failed to extract segment at {start_seconds:.0f}s: {e}")
+    return output_path
+
+def _overlap_ms(a, b):
+    return max(0, min(a["end_ms"], b["end_ms"]) - max(a["start_ms"], b["start_ms"]))
+
+def _talk_time(utterances):
+    talk = {}
+    for u in utterances:
+        talk[u["speaker"]] = talk.get(u["speaker"], 0) + u["end_ms"] - u["start_ms"]
+    return talk
+
+def _map_speakers(previous, current, window_start_ms, window_end_ms, used_labels):
+    """
+    Map the local speaker labels of `current` onto the global labels of `previous`
+    by how long they talk at the same time inside the overlap window. Pairs with the
+    most shared time win. Speakers silent in the overlap take the global labels left
+    over, most talkative first, so a recurring speaker keeps one label; fresh labels
+    are only handed out once every known label is taken.
+    """
+    def in_window(u):
+        return u["end_ms"] > window_start_ms and u["start_ms"] < window_end_ms
+
+    shared = {}
+    for cur in filter(in_window, current):
+        for prev in filter(in_window, previous):
+            overlap = _overlap_ms(cur, prev)
+            if overlap:
+                key = (cur["speaker"], prev["speaker"])
+                shared[key] = shared.get(key, 0) + overlap
+
+    mapping = {}
+    taken = set()
+    for (local, global_label), _ in sorted(shared.items(), key=lambda item: -item[1]):
+        if local not in mapping and global_label not in taken:
+            mapping[local] = global_label
+            taken.add(global_label)
+
+    # Known labels not matched above: the previous segment's speakers first, by talk time
+    previous_talk = _talk_time(previous)
+    leftover = sorted(set(previous_talk) - taken, key=lambda label: (-previous_talk[label], label))
+    leftover += sorted(used_labels - taken - set(previous_talk))
+
+    current_talk = _talk_time(current)
+    next_label = 0
+    for local in sorted(set(current_talk) - set(mapping), key=lambda label: (-current_talk[label], label)):
+        if leftover:
+            mapping[local] = leftover.pop(0)
+        else:
+            while speaker_label(next_label) in used_labels or speaker_label(next_label) in taken:
+                next_label += 1
+            mapping[local] = speaker_label(next_label)
+        taken.add(mapping[local])
+    return mapping
+
+def _shift(utterance, offset_ms):
+    shifted = dict(
+        utterance,
+        start_ms=(utterance.get("start_ms") or 0) + offset_ms,
+        end_ms=(utterance.get("end_ms") or 0) + offset_ms
+    )
+    if utterance.get("words"):
+        shifted["words"] = [
+            dict(w, start_ms=w["start_ms"] + offset_ms, end_ms=w["end_ms"] + offset_ms) for w in utterance["words"]
+        ]
+    return shifted
+
+def _clip_words(utterance, keep):
+    """Rebuild an utterance from the words whose midpoint passes keep(ms); None if none do."""
+    words = [w for w in utterance["words"] if keep((w["start_ms"] + w["end_ms"]) / 2)]
+    if not words:
+        return None
+    if len(words) == len(utterance["words"]):
+        return utterance
+    return dict(
+        utterance, words=words, start_ms=words[0]["start_ms"], end_ms=words[-1]["end_ms"],
+        text=" ".join(w["text"] for w in words)
+    )
+
+def _cut(utterances, cut_ms, before):
+    """
+    Keep what lies before cut_ms (before=True) or from cut_ms on. An utterance running
+    across the cut is split at its word times; without words it goes to the side its
+    midpoint falls on. Returns (kept, wordless utterances kept across the cut, split ones).
+    """
+    def keep(ms):
+        return ms < cut_ms if before else ms >= cut_ms
+
+    kept, straddling, split = [], [], []
+    for u in utterances:
+        across = u["start_ms"] < cut_ms < u["end_ms"]
+        if across and u.get("words"):
+            u = _clip_words(u, keep)
+            if u is not None:
+                split.append(u)
+        elif keep((u["start_ms"] + u["end_ms"]) / 2):
+            if across:
+                straddling.append(u)
+        else:
+            u = None
+        if u is not None:
+            kept.append(u)
+    return kept, straddling, split
+
+def merge_segments(segment_results):
+    """
+    Merge per-segment utterances into one ordered list.
+
+    segment_results is a list of (start_seconds, length_seconds, utterances) in order, with
+    utterance times relative to each segment. Times are shifted to the whole recording,
+    overlaps are de-duplicated by cutting at the middle of each overlap (inside utterances
+    at word boundaries when they have "words"), and speaker labels are reconciled across
+    segments. The merged utterances are returned without their words.
+    """
+    merged = []
+    previous = []
+    used_labels = set()
+
+    for index, (start_seconds, length_seconds, utterances) in enumerate(segment_results):
+        offset_ms = int(start_seconds * 1000)
+        shifted = [_shift(u, offset_ms) for u in utterances]
+
+        if index == 0:
+            mapping = {u["speaker"]: u["speaker"] for u in shifted}
+        else:
+            previous_start, previous_length, _ = segment_results[index - 1]
+            window_end_ms = int((previous_start + previous_length) * 1000)
+            mapping = _map_speakers(previous, shifted, offset_ms, window_end_ms, used_labels)
+        for u in shifted:
+            u["speaker"] = mapping[u["speaker"]]
+        used_labels.update(mapping.values())
+
+        if index == 0:
+            kept = shifted
+        else:
+            # Cut point in the middle of the overlap with the previous segment
+            cut_ms = (offset_ms + window_end_ms) // 2
+            merged, earlier_straddling, earlier_split = _cut(merged, cut_ms, before=True)
+            kept, later_straddling, later_split = _cut(shifted, cut_ms, before=False)
+            # Without word times a turn heard by both segments cannot be split at the cut:
+            # of the two copies the longer one, which holds more of the turn, is kept
+            duplicates = []
+            for u in earlier_straddling:
+                for v in later_straddling:
+                    if u["speaker"] == v["speaker"] and _overlap_ms(u, v):
+                        longer = u["end_ms"] - u["start_ms"] >= v["end_ms"] - v["start_ms"]
+                        duplicates.append(v if longer else u)
+            merged = [u for u in merged if not any(u is d for d in duplicates)]
+            kept = [u for u in kept if not any(u is d for d in duplicates)]
+            # The two halves of one turn split at the cut become one utterance again
+            if (merged and kept and merged[-1]["speaker"] == kept[0]["speaker"]
+                    and any(merged[-1] is u for u in earlier_split) and any(kept[0] is u for u in later_split)):
+                first = merged.pop()
+                kept[0] = dict(
+                    kept[0], start_ms=first["start_ms"], words=first["words"] + kept[0]["words"],
+                    text=f"{first['text']} {kept[0]['text']}"
+                )
+
+        merged.extend(kept)
+        previous = shifted
+
+    return [{key: value for key, value in u.items() if key != "words"} for u in merged]
+
+def _count_audio_seconds(utterances):
+    """Count transcribed audio by the end of the last utterance (no extra ffprobe run)."""
+    if utterances:
+        AUDIO_SECONDS.inc(max(u.get("end_ms") or 0 for u in utterances) / 1000)
+
+def transcribe_file(audio_path, word_boost="", language="auto", speaker_labels=True, on_stage=None,
+                    transcriber=None, chunked=None, trim=None):
+    """
+    Transcribe an uploaded file with the configured provider.
+    With silence trimming on, long silences are shortened first and the utterance times
+    are mapped back to the original recording; the result then also has
+    "silence_removed_seconds".
+    With chunked mode on, recordings longer than CHUNK_THRESHOLD_SECONDS are split into
+    overlapping segments that are transcribed concurrently and stitched back together.
+    """
+    transcriber = transcriber or get_transcriber()
+    chunked = CHUNKED_TRANSCRIPTION if chunked is None else chunked
+    options = {"word_boost": word_boost, "language": language, "speaker_labels": speaker_labels}
+
+    if not (SILENCE_TRIMMING if trim is None else trim):
+        return _transcribe(audio_path, transcriber, chunked, options, on_stage)
+
+    if on_stage:
+        on_stage("converting")
+    with stage_timer("trim_silence"):
+        trimmed = trim_silence(audio_path)
+    if trimmed is None:
+        return _transcribe(audio_path, transcriber, chunked, options, on_stage)
+
+    trimmed_path, time_map, report = trimmed
+    print(
+        f"Silence trimming removed {report['removed_seconds']:.1f}s of {report['original_seconds']:.1f}s"
+    )
+    SILENCE_REMOVED_SECONDS.inc(report["removed_seconds"])
+    try:
+        result = _transcribe(trimmed_path, transcriber, chunked, options, on_stage)
+    finally:
+        clean_temp_files([trimmed_path])
+    result["utterances"] = time_map.map_utterances(result["utterances"])
+    result["silence_removed_seconds"] = report["removed_seconds"]
+    return result
+
+def _transcribe(audio_path, transcriber, chunked, options, on_stage):
+    """Transcribe one file in a single request, or in concurrent segments when it is long."""
+    info = probe_audio(audio_path) if chunked else None
+    if not info or info["duration"] <= CHUNK_THRESHOLD_SECONDS:
+        result = transcriber.transcribe(audio_path, on_stage=on_stage, **options)
+        _count_audio_seconds(result["utterances"])
+        return result
+
+    segments = plan_segments(info["duration"])
+    print(f"Chunked transcription: {len(segments)} segments of up to {SEGMENT_SECONDS:.0f}s")
+
+    if on_stage:
+        on_stage("converting")
+    extractions = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, TRANSCRIPTION_MAX_PARALLEL)) as executor:
+            with stage_timer("convert"):
+                extractions = [executor.submit(extract_segment, audio_path, *segment) for segment in segments]
+                try:
+                    segment_files = [extraction.result() for extraction in extractions]
+                except BaseException:
+                    # Segments not started yet are skipped; running ones finish and are cleaned below
+                    for extraction in extractions:
+                        extraction.cancel()
+                    raise
+
+            if on_stage:
+                on_stage("transcribing")
+            # Word times let the merge cut inside utterances that run across a cut point
+            results = list(executor.map(
+                lambda path: transcriber.transcribe(path, word_timestamps=True, **options), segment_files
+            ))
+    finally:
+        # The executor has waited for every extraction, so this sees all segment files written
+        clean_temp_files([
+            extraction.result() for extraction in extractions
+            if extraction.done() and not extraction.cancelled() and extraction.exception() is None
+        ])
+
+    merged = merge_segments([
+        (start, length, result["utterances"] or [])
+        for (start, length), result in zip(segments, results)
+    ])
+    AUDIO_SECONDS.inc(info["duration"])
+    return build_transcript_result(merged)
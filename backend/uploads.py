@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from starlette.concurrency import run_in_threadpool
+
+from models import DATA_DIR
+from services import UPLOAD_CHUNK_SIZE, UploadTooLargeError
+
+# Resumable uploads: sessions live on disk so they survive restarts
+RESUMABLE_UPLOAD_DIR = os.getenv("RESUMABLE_UPLOAD_DIR", os.path.join(DATA_DIR, "uploads"))
+RESUMABLE_MAX_UPLOAD_SIZE = int(os.getenv("RESUMABLE_MAX_UPLOAD_SIZE", str(2 * 1024 * 1024 * 1024)))  # 2GB
+RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", str(8 * 1024 * 1024)))  # 8MB, well under proxy body limits
+RESUMABLE_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+RESUMABLE_UPLOAD_TTL_SECONDS = int(os.getenv("RESUMABLE_UPLOAD_TTL_SECONDS", "86400"))
+
+class UploadSessionError(Exception):
+    """Raised for requests that do not fit the state of an upload session."""
+    pass
+
+class UploadSessionNotFound(UploadSessionError):
+    pass
+
+class UploadSession:
+    """
+    A resumable upload on disk: meta.json, a data file the chunks are written into at their
+    offsets, and one empty marker file per chunk that has been fully written.
+    """
+
+    def __init__(self, upload_id, meta):
+        self.id = upload_id
+        self.meta = meta
+        self.directory = _session_dir(upload_id)
+
+    @property
+    def data_path(self):
+        return os.path.join(self.directory, "data")
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.meta["size"] // self.meta["chunk_size"]))
+
+    def chunk_length(self, index):
+        """Expected byte length of chunk `index` (the last one may be shorter)."""
+        start = index * self.meta["chunk_size"]
+        return min(self.meta["chunk_size"], self.meta["size"] - start)
+
+    def received_chunks(self):
+        received = []
+        for name in os.listdir(os.path.join(self.directory, "received")):
+            if name.isdigit():
+                received.append(int(name))
+        return sorted(received)
+
+    def touch(self):
+        os.utime(self.directory)
+
+    def expires_at(self):
+        return os.path.getmtime(self.directory) + RESUMABLE_UPLOAD_TTL_SECONDS
+
+    def to_dict(self):
+        received = self.received_chunks()
+        received_set = set(received)
+        return {
+            "upload_id": self.id,
+            "filename": self.meta["filename"],
+            "size_bytes": self.meta["size"],
+            "chunk_size": self.meta["chunk_size"],
+            "total_chunks": self.total_chunks,
+            "received_chunks": received,
+            "missing_chunks": [index for index in range(self.total_chunks) if index not in received_set],
+            "received_bytes": sum(self.chunk_length(index) for index in received),
+            "expires_at": self.expires_at(),
+        }
+
+def _session_dir(upload_id):
+    return os.path.join(RESUMABLE_UPLOAD_DIR, upload_id)
+
+def expire_upload_sessions(now=None):
+    """Delete sessions with no activity for RESUMABLE_UPLOAD_TTL_SECONDS. Returns how many were removed."""
+    now = now or time.time()
+    if not os.path.isdir(RESUMABLE_UPLOAD_DIR):
+        return 0
+    removed = 0
+    for upload_id in os.listdir(RESUMABLE_UPLOAD_DIR):
+        directory = _session_dir(upload_id)
+        if not os.path.isdir(directory):
+            continue  # a finalized upload waiting for its job
+        try:
+            if os.path.getmtime(directory) + RESUMABLE_UPLOAD_TTL_SECONDS < now:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        print(f"Expired {removed} stale upload session(s)")
+    return removed
+
+def create_upload_session(filename, size, chunk_size=None, language="auto", word_boost=""):
+    """Start a resumable upload of `size` bytes and return its UploadSession."""
+    if size <= 0:
+        raise UploadSessionError("size must be positive")
+    if size > RESUMABLE_MAX_UPLOAD_SIZE:
+        raise UploadTooLargeError(
+            f"File too large. Maximum size is {RESUMABLE_MAX_UPLOAD_SIZE // (1024 * 1024)}MB."
+        )
+    chunk_size = chunk_size or RESUMABLE_CHUNK_SIZE
+    if not 0 < chunk_size <= RESUMABLE_MAX_CHUNK_SIZE:
+        raise UploadSessionError(f"chunk_size must be between 1 and {RESUMABLE_MAX_CHUNK_SIZE} bytes")
+
+    expire_upload_sessions()
+
+    upload_id = uuid.uuid4().hex
+    directory = _session_dir(upload_id)
+    os.makedirs(os.path.join(directory, "received"))
+    meta = {
+        "filename": filename,
+        "size": size,
+        "chunk_size": chunk_size,
+        "language": language,
+        "word_boost": word_boost,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    # Sparse file of the final size; chunks are written at their offsets in any order
+    with open(os.path.join(directory, "data"), "wb") as f:
+        f.truncate(size)
+    return UploadSession(upload_id, meta)
+
+def get_upload_session(upload_id):
+    """Return the live UploadSession for upload_id, or raise UploadSessionNotFound."""
+    if not upload_id.isalnum():
+        raise UploadSessionNotFound("Upload session not found")
+    directory = _session_dir(upload_id)
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        raise UploadSessionNotFound("Upload session not found")
+    session = UploadSession(upload_id, meta)
+    if session.expires_at() < time.time():
+        shutil.rmtree(directory, ignore_errors=True)
+        raise UploadSessionNotFound("Upload session expired")
+    return session
+
+def _chunk_marker(session, index):
+    return os.path.join(session.directory, "received", str(index))
+
+def _open_chunk(session, index):
+    """Open the data file for writing chunk `index`, which is not received until rewritten."""
+    fd = os.open(session.data_path, os.O_WRONLY)
+    try:
+        os.unlink(_chunk_marker(session, index))
+    except FileNotFoundError:
+        pass
+    return fd
+
+def _finish_chunk(session, fd, index):
+    """Flush a written chunk to disk and mark it received."""
+    os.fsync(fd)
+    open(_chunk_marker(session, index), "w").close()
+    session.touch()
+
+async def write_chunk(session, index, stream):
+    """
+    Write chunk `index` from an async byte stream straight to its offset in the data file.
+    The chunk counts as received only once all of its bytes are on disk. Writes and the
+    fsync run in the threadpool so a slow disk never blocks the event loop.
+    """
+    if not 0 <= index < session.total_chunks:
+        raise UploadSessionError(f"Chunk index must be between 0 and {session.total_chunks - 1}")
+    expected = session.chunk_length(index)
+    offset = index * session.meta["chunk_size"]
+    written = 0
+    buffer = bytearray()
+
+    try:
+        fd = await run_in_threadpool(_open_chunk, session, index)
+    except FileNotFoundError:
+        raise UploadSessionNotFound("Upload session not found")
+    try:
+        async for piece in stream:
+            if written + len(buffer) + len(piece) > expected:
+                raise UploadSessionError(f"Chunk {index} must be exactly {expected} bytes")
+            # Large request bodies arrive in small pieces; write them out a buffer at a time
+            buffer += piece
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                written += await run_in_threadpool(os.pwrite, fd, bytes(buffer), offset + written)
+                buffer.clear()
+        if written + len(buffer) != expected:
+            raise UploadSessionError(f"Chunk {index} must be exactly {expected} bytes, got {written + len(buffer)}")
+        if buffer:
+            written += await run_in_threadpool(os.pwrite, fd, bytes(buffer), offset + written)
+        await run_in_threadpool(_finish_chunk, session, fd, index)
+    finally:
+        os.close(fd)
+    return written
+
+def finalize_upload_session(session):
+    """
+    Check that every chunk arrived, hash the assembled file and move it out of the session.
+    Returns (file_path, size_in_bytes, sha256_hex) ready for the upload pipeline.
+    """
+    missing = session.to_dict()["missing_chunks"]
+    if missing:
+        raise UploadSessionError(f"{len(missing)} chunk(s) missing, first missing chunk is {missing[0]}")
+
+    # Moving the data file out claims the session, so it can only be finalized once.
+    # It stays in the same directory tree, so this is a rename rather than a copy.
+    _, extension = os.path.splitext(session.meta["filename"] or "")
+    file_path = os.path.join(RESUMABLE_UPLOAD_DIR, f"{session.id}{extension}")
+    try:
+        os.rename(session.data_path, file_path)
+    except FileNotFoundError:
+        raise UploadSessionNotFound("Upload session was already finalized")
+    shutil.rmtree(session.directory, ignore_errors=True)
+
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            sha256.update(block)
+    return file_path, session.meta["size"], sha256.hexdigest()
+
+def delete_upload_session(session):
+    """Abort an upload and remove everything received so far."""
+    shutil.rmtree(session.directory, ignore_errors=True)
@@ -0,0 +1,124 @@
+import difflib
+import json
+import re
+
+from sqlalchemy import func, insert, literal
+
+from models import Utterance, Transcription, next_version
+
+_UTTERANCE_LINE = re.compile(r"^Speaker ([^:\n]+):[ \t]?(.*)$")
+
+def parse_utterances(transcript):
+    """
+    Split a "Speaker X: ..." transcript into utterances without timestamps.
+    Lines that don't start a new speaker turn are appended to the previous one.
+    """
+    utterances = []
+    for line in (transcript or "").splitlines():
+        match = _UTTERANCE_LINE.match(line)
+        if match:
+            utterances.append({"speaker": match.group(1).strip(), "text": match.group(2)})
+        elif utterances:
+            utterances[-1]["text"] += "\n" + line
+        elif line.strip():
+            utterances.append({"speaker": "Unknown", "text": line})
+    return utterances
+
+def save_utterances(db, transcription_id, utterances):
+    """Bulk insert utterances for a transcription in one executemany. Caller commits."""
+    if not utterances:
+        return 0
+    rows = [
+        {
+            "transcription_id": transcription_id,
+            "idx": idx,
+            "speaker": utterance.get("speaker"),
+            "start_ms": utterance.get("start_ms"),
+            "end_ms": utterance.get("end_ms"),
+            "text": utterance.get("text"),
+            "confidence": utterance.get("confidence"),
+        }
+        for idx, utterance in enumerate(utterances)
+    ]
+    db.execute(insert(Utterance), rows)
+    return len(rows)
+
+def replace_utterances(db, transcription_id, utterances):
+    """Replace all utterances of a transcription. Caller commits."""
+    db.query(Utterance).filter(Utterance.transcription_id == transcription_id).delete(synchronize_session=False)
+    return save_utterances(db, transcription_id, utterances)
+
+def reconcile_utterances(old, new):
+    """
+    Carry timestamps from stored utterances (`old`, Utterance rows) over to freshly parsed
+    ones (`new`, dicts) after a text edit. Unchanged turns keep their timing and confidence;
+    edited turns that still line up one-to-one with an old turn keep its timing.
+    """
+    matcher = difflib.SequenceMatcher(
+        a=[(u.speaker, u.text) for u in old], b=[(u["speaker"], u["text"]) for u in new], autojunk=False
+    )
+    for tag, a_start, a_end, b_start, b_end in matcher.get_opcodes():
+        if tag == "equal" or (tag == "replace" and a_end - a_start == b_end - b_start):
+            for source, target in zip(old[a_start:a_end], new[b_start:b_end]):
+                target["start_ms"] = source.start_ms
+                target["end_ms"] = source.end_ms
+                target["confidence"] = source.confidence if tag == "equal" else None
+    return new
+
+def get_utterances(db, transcription_id, start_ms=None, end_ms=None, from_idx=None, to_idx=None, limit=500):
+    """
+    Fetch utterances of a transcription by time window (overlapping [start_ms, end_ms))
+    and/or index range [from_idx, to_idx), in order.
+    """
+    query = db.query(Utterance).filter(Utterance.transcription_id == transcription_id)
+    if start_ms is not None:
+        query = query.filter(Utterance.end_ms > start_ms)
+    if end_ms is not None:
+        query = query.filter(Utterance.start_ms < end_ms)
+    if from_idx is not None:
+        query = query.filter(Utterance.idx >= from_idx)
+    if to_idx is not None:
+        query = query.filter(Utterance.idx < to_idx)
+    return query.order_by(Utterance.idx).limit(limit).all()
+
+def count_utterances(db, transcription_id):
+    return db.query(func.count(Utterance.id)).filter(Utterance.transcription_id == transcription_id).scalar()
+
+def rename_speaker(db, transcription, old_name, new_name):
+    """
+    Rename a speaker with set-based UPDATEs: utterance rows, and the
+    "Speaker X:" line prefixes of the transcript text, rewritten inside the database.
+    Caller commits. Returns the number of utterances renamed.
+    """
+    renamed = db.query(Utterance).filter(
+        Utterance.transcription_id == transcription.id,
+        Utterance.speaker == old_name
+    ).update({"speaker": new_name}, synchronize_session=False)
+
+    try:
+        speakers = json.loads(transcription.speakers or "[]")
+    except json.JSONDecodeError:
+        speakers = []
+    for speaker in speakers:
+        if speaker.get("speaker") == old_name:
+            speaker["speaker"] = new_name
+    # Prefixing a newline lets replace() match only at line starts. The concatenation is left
+    # to SQLAlchemy because databases spell it differently (|| or concat()).
+    transcript = func.substr(
+        func.replace(literal("\n") + Transcription.transcript, f"\nSpeaker {old_name}:", f"\nSpeaker {new_name}:"), 2
+    )
+    db.query(Transcription).filter(Transcription.id == transcription.id).update(
+        {"transcript": transcript, "speakers": json.dumps(speakers), "version": next_version()},
+        synchronize_session=False
+    )
+    return renamed
+
+def utterance_to_dict(utterance):
+    return {
+        "idx": utterance.idx,
+        "speaker": utterance.speaker,
+        "start_ms": utterance.start_ms,
+        "end_ms": utterance.end_ms,
+        "text": utterance.text,
+        "confidence": utterance.confidence,
+    }
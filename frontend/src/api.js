@@ -2,6 +2,11 @@ import axios from 'axios'
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api'
 
+// Files above this size go through resumable chunked uploads
+export const RESUMABLE_UPLOAD_THRESHOLD = 50 * 1024 * 1024
+const UPLOAD_PARALLEL_CHUNKS = 3
+const UPLOAD_CHUNK_RETRIES = 4
+
 // Create axios instance
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -11,9 +16,11 @@ const api = axios.create({
 })
 
 export const transcriptionAPI = {
-  upload: async (file) => {
+  upload: async (file, language = 'auto', wordBoost = '') => {
     const formData = new FormData()
     formData.append('file', file)
+    formData.append('language', language)
+    formData.append('word_boost', wordBoost)
     
     const response = await api.post('/upload', formData, {
       headers: {
@@ -23,6 +30,68 @@ export const transcriptionAPI = {
     return response.data
   },
 
+  // Upload in chunks that can be retried individually; an interrupted upload of the same
+  // file resumes where it stopped (the session id is kept in localStorage)
+  uploadResumable: async (file, language = 'auto', wordBoost = '', onProgress = () => {}) => {
+    const storageKey = `upload:${file.name}:${file.size}:${file.lastModified}`
+    let session = null
+    const savedId = localStorage.getItem(storageKey)
+    if (savedId) {
+      try {
+        session = (await api.get(`/uploads/${savedId}`)).data
+      } catch (error) {
+        localStorage.removeItem(storageKey)
+      }
+    }
+    if (!session) {
+      session = (await api.post('/uploads', {
+        filename: file.name,
+        size: file.size,
+        language,
+        word_boost: wordBoost
+      })).data
+      localStorage.setItem(storageKey, session.upload_id)
+    }
+
+    const pending = [...session.missing_chunks]
+    let receivedBytes = session.received_bytes
+    onProgress(receivedBytes / file.size)
+
+    const sendChunk = async (index) => {
+      const start = index * session.chunk_size
+      const chunk = file.slice(start, Math.min(start + session.chunk_size, file.size))
+      for (let attempt = 0; ; attempt++) {
+        try {
+          await api.put(`/uploads/${session.upload_id}/chunks/${index}`, chunk, {
+            headers: { 'Content-Type': 'application/octet-stream' },
+          })
+          receivedBytes += chunk.size
+          onProgress(receivedBytes / file.size)
+          return
+        } catch (error) {
+          const status = error.response?.status
+          if (attempt >= UPLOAD_CHUNK_RETRIES || (status && status < 500)) throw error
+          await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt))
+        }
+      }
+    }
+    const worker = async () => {
+      while (pending.length) {
+        await sendChunk(pending.shift())
+      }
+    }
+    await Promise.all(Array.from({ length: UPLOAD_PARALLEL_CHUNKS }, worker))
+
+    const response = await api.post(`/uploads/${session.upload_id}/complete`)
+    localStorage.removeItem(storageKey)
+    return response.data
+  },
+
+  getJob: async (jobId) => {
+    const response = await api.get(`/jobs/${jobId}`)
+    return response.data
+  },
+
   saveDirectTranscript: async (filename, transcript, speakers = '[]') => {
     const response = await api.post('/transcript', {
       filename,
@@ -32,18 +101,74 @@ export const transcriptionAPI = {
     return response.data
   },
 
-  get: async (id) => {
-    const response = await api.get(`/transcription/${id}`)
+  list: async ({ limit = 20, cursor = null, filename = null, createdAfter = null, createdBefore = null } = {}) => {
+    const params = { limit }
+    if (cursor) params.cursor = cursor
+    if (filename) params.filename = filename
+    if (createdAfter) params.created_after = createdAfter
+    if (createdBefore) params.created_before = createdBefore
+    const response = await api.get('/transcriptions', { params })
     return response.data
   },
 
-  summarize: async (id, language = 'en', temperature = 0.8) => {
+  search: async (q, limit = 20, offset = 0) => {
+    const response = await api.get('/search', { params: { q, limit, offset } })
+    return response.data
+  },
+
+  get: async (id, fields = null) => {
+    const params = fields ? { fields: fields.join(',') } : {}
+    const response = await api.get(`/transcription/${id}`, { params })
+    return response.data
+  },
+
+  getUtterances: async (id, { startMs = null, endMs = null, fromIdx = null, toIdx = null, limit = 500 } = {}) => {
+    const params = { limit }
+    if (startMs !== null) params.start_ms = startMs
+    if (endMs !== null) params.end_ms = endMs
+    if (fromIdx !== null) params.from_idx = fromIdx
+    if (toIdx !== null) params.to_idx = toIdx
+    const response = await api.get(`/transcription/${id}/utterances`, { params })
+    return response.data
+  },
+
+  renameSpeaker: async (id, speaker, name) => {
+    const response = await api.put(`/transcription/${id}/speakers/${encodeURIComponent(speaker)}`, { name })
+    return response.data
+  },
+
+  updateTranscript: async (id, transcript, speakers) => {
+    const response = await api.put(`/transcription/${id}`, { transcript, speakers })
+    return response.data
+  },
+
+  summarize: async (id, language = 'en', temperature = 0.8, force = false) => {
     const response = await api.post(`/summarize/${id}`, null, {
-      params: { language, temperature }
+      params: { language, temperature, force }
     })
     return response.data
   },
 
+  streamSummary: (id, language = 'en', temperature = 0.8, onDelta = () => {}, force = false) => {
+    return new Promise((resolve, reject) => {
+      const params = new URLSearchParams({ language, temperature, force })
+      const source = new EventSource(`${API_BASE_URL}/summarize/${id}/stream?${params}`)
+
+      source.addEventListener('delta', (event) => {
+        onDelta(JSON.parse(event.data).text)
+      })
+      source.addEventListener('done', (event) => {
+        source.close()
+        resolve(JSON.parse(event.data))
+      })
+      // Fired both for server-sent error events (with data) and for connection failures
+      source.addEventListener('error', (event) => {
+        source.close()
+        reject(new Error(event.data ? JSON.parse(event.data).detail : 'Connection to summary stream lost'))
+      })
+    })
+  },
+
   export: async (id) => {
     const response = await api.get(`/export/${id}`, {
       responseType: 'blob',